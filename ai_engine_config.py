@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Mapping, Optional
 
 
 @dataclass(frozen=True)
@@ -12,6 +12,7 @@ class EngineSettings:
     show_reasoning: bool
     reasoning_effort: str
     debug_api: bool
+    http2: bool = False
 
 
 def resolve_api_key(
@@ -44,10 +45,10 @@ def resolve_model(
     return default_model
 
 
-def _compute_show_reasoning(config: Dict[str, Any]) -> bool:
-    env_toggle = os.environ.get("AI_SHOW_REASONING")
+def _compute_show_reasoning(config: Dict[str, Any], env: Mapping[str, str]) -> bool:
+    env_toggle = env.get("AI_SHOW_REASONING")
     if env_toggle is None:
-        env_toggle = os.environ.get("AI_SHOW_THINKING")
+        env_toggle = env.get("AI_SHOW_THINKING")
     config_value = config.get("show_reasoning")
     if config_value is None:
         config_value = config.get("show_thinking", True)
@@ -56,8 +57,8 @@ def _compute_show_reasoning(config: Dict[str, Any]) -> bool:
     return bool(config_value)
 
 
-def _compute_reasoning_effort(config: Dict[str, Any]) -> str:
-    env_effort = os.environ.get("AI_REASONING_EFFORT")
+def _compute_reasoning_effort(config: Dict[str, Any], env: Mapping[str, str]) -> str:
+    env_effort = env.get("AI_REASONING_EFFORT")
     config_effort = config.get("reasoning_effort")
     if env_effort:
         return env_effort
@@ -66,20 +67,29 @@ def _compute_reasoning_effort(config: Dict[str, Any]) -> str:
     return "medium"
 
 
-def _compute_debug_flag() -> bool:
-    debug_env = os.environ.get("AI_DEBUG_REASONING") or os.environ.get("AI_DEBUG_API")
+def _compute_debug_flag(env: Mapping[str, str]) -> bool:
+    debug_env = env.get("AI_DEBUG_REASONING") or env.get("AI_DEBUG_API")
     return bool(debug_env)
 
 
+def _compute_http2_flag(config: Dict[str, Any], env: Mapping[str, str]) -> bool:
+    env_toggle = env.get("AI_HTTP2")
+    if env_toggle is not None:
+        return env_toggle.lower() not in {"", "0", "false", "no"}
+    return bool(config.get("http2", False))
+
+
 def build_engine_settings(
     config: Dict[str, Any], default_model: str = "gpt-5-codex"
 ) -> EngineSettings:
+    env = os.environ
     return EngineSettings(
         api_key=resolve_api_key(config=config),
         default_model=default_model,
-        show_reasoning=_compute_show_reasoning(config),
-        reasoning_effort=_compute_reasoning_effort(config),
-        debug_api=_compute_debug_flag(),
+        show_reasoning=_compute_show_reasoning(config, env),
+        reasoning_effort=_compute_reasoning_effort(config, env),
+        debug_api=_compute_debug_flag(env),
+        http2=_compute_http2_flag(config, env),
     )
 
 
@@ -1,17 +1,34 @@
 from __future__ import annotations
 
-import json
+import os
 import re
+import stat
 import sys
 import textwrap
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from functools import partial
+from operator import attrgetter
 from pathlib import Path
-from typing import Any, Dict, List, Optional, TextIO, cast
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    TextIO,
+    cast,
+)
 
 import openai
 
 from contextualizer import (
     collect_context,
     format_context_for_prompt,
+    refresh_paths,
+    scope_fingerprint,
     DEFAULT_READ_LIMIT,
     MAX_READ_BYTES,
 )
@@ -25,17 +42,127 @@ from ai_engine_tools import (
     TOOL_DEFINITIONS,
     ToolRuntime,
     apply_file_update,
-    delete_path_via_shell,
+    delete_path,
     handle_shell_command,
     handle_tool_call,
     instruction_implies_write,
     JFDI_REQUIRED_MESSAGE,
+    to_plain_data,
+    make_assistant_message,
+    make_tool_call_item,
+    make_tool_result_message,
+    make_user_message,
+    read_utf8_text,
 )
 from orchestra_runtime import OrchestraRuntime
 from orchestra_scheduler import OrchestraScheduler
 from orchestra_tools import handle_orchestra_tool_call
 
 NEW_CONVERSATION_TOKEN = "<<NEW_CONVERSATION>>"
+MAX_REFRESH_PATHS = 16
+# Assistant deltas arriving within this window are rendered as one update.
+STREAM_COALESCE_NS = 8_000_000
+SUPERSEDED_SNAPSHOT_TEXT = (
+    "Updated repository snapshot: (superseded by a later snapshot; omitted)"
+)
+# Superseded snapshots are collapsed only once they add up to this much.
+SNAPSHOT_COMPACT_BYTES = 4 * MAX_READ_BYTES
+_REASONING_KEEP = ("type", "id", "summary", "content")
+# SDK delta events carry every key field; the getattr defaults are the fallback.
+_CONTENT_KEY_ATTRS = attrgetter("item_id", "content_index")
+_SUMMARY_KEY_ATTRS = attrgetter("item_id", "summary_index")
+_NO_WRITE_RE = re.compile(
+    r"\b(?:created|saved|written|added|generated)\b", re.IGNORECASE
+)
+
+_ORCHESTRATOR_PROMPT_TEMPLATE = textwrap.dedent(
+    """
+    You are Codex CLI in orchestrator mode. You may call orchestration tools to compose an ensemble,
+    set musician mandates, dispatch assignments, poll or wait, collect results, and synthesize a final answer.
+    Use first-principles thinking for each new user task and redefine mandates when task intent changes.
+    The human user interacts only with you (the orchestrator), not with musicians.
+    Treat `{dog_phrase}` as execution approval for mutating operations.
+    {scope_sentence}
+    """
+).strip()
+
+_SYSTEM_PROMPT_TEMPLATE = textwrap.dedent(
+    """
+    You are Codex CLI operating locally. You can call tools to read files, write files,
+    update plans, or execute sandboxed shell commands. IMPORTANT: when you need to
+    create or modify files you MUST call the `write` tool (alias: `write_file`) with the full content (not apply_patch). Do not
+    use shell globbing to list files; prefer the dedicated `glob` tool for pattern-based listings, use `search_content` instead of shell grep for searching text, and use the todo/plan tool (`plan_update`) when a structured checklist will help (multi-step work, explicit user requests, or when you need to show progress). Track tasks with the standard states (`pending`, `in_progress`, `completed`, `cancelled`) and keep at most one item `in_progress` at a time.
+    Treat the user command `{dog_phrase}` as "just fucking do it"—the user believes you have enough context, the plan looks good, and it is time to execute without further hesitations.
+    File edits, deletions, renames, and shell commands are blocked until the user types `{dog_phrase}` in this session. Purely read-only actions (reading files, globbing, searching) are always allowed. Mention `{dog_phrase}` only when you actually need approval—don’t repeat the reminder after you’ve delivered final results.
+    claim success unless the tool call succeeds. Maintain an explicit plan when useful
+    using `update_plan`. Always cite relevant files.
+    {scope_sentence}
+    """
+).strip()
+
+
+def _build_http_client(http2: bool) -> Any:
+    # Opt-in: multiplexes API requests over one TLS connection.
+    # httpx ships with the SDK but HTTP/2 also needs the optional h2 package.
+    if not http2:
+        return None
+    try:
+        import h2  # noqa: F401
+        import httpx
+    except ImportError:
+        return None
+    return httpx.Client(http2=True)
+
+
+def _collect_output_text(data: Any) -> str:
+    # Depth-first over output/choices/content; a node's own "text" follows
+    # its children, so it is pushed before them on the LIFO stack.
+    chunks: List[str] = []
+    stack: List[Any] = [data]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, str):
+            chunks.append(obj)
+        elif isinstance(obj, dict):
+            text_value = obj.get("text")
+            if isinstance(text_value, str):
+                stack.append(text_value)
+            output = obj.get("output") or obj.get("choices") or obj.get("content")
+            if isinstance(output, list):
+                stack.extend(reversed(output))
+            elif isinstance(output, dict):
+                stack.append(output)
+        elif isinstance(obj, list):
+            stack.extend(reversed(obj))
+    return "".join(chunks)
+
+
+@dataclass(slots=True)
+class _StreamState:
+    response: Any = None
+    stop: bool = False
+    previous_message: Optional[str] = None
+    reasoning_buffers: dict[str, list[str]] = field(default_factory=dict)
+    assistant_stream_buffers: dict[str, list[str]] = field(default_factory=dict)
+    assistant_stream_cache: dict[str, str] = field(default_factory=dict)
+    streamed_render_keys: set[str] = field(default_factory=set)
+    rendered_messages: set[str] = field(default_factory=set)
+    pending_reasoning_queue: Deque[Dict[str, Any]] = field(default_factory=deque)
+    pending_deltas: dict[str, list[str]] = field(default_factory=dict)
+    delta_deadline_ns: int = 0
+
+    def reset(self) -> None:
+        self.response = None
+        self.stop = False
+        self.previous_message = None
+        self.reasoning_buffers.clear()
+        self.assistant_stream_buffers.clear()
+        self.assistant_stream_cache.clear()
+        self.streamed_render_keys.clear()
+        self.rendered_messages.clear()
+        self.pending_reasoning_queue.clear()
+        self.pending_deltas.clear()
+        self.delta_deadline_ns = 0
 
 
 class AIEngine:
@@ -54,34 +181,82 @@ class AIEngine:
         settings = build_engine_settings(config, default_model)
         self.default_model = settings.default_model
         self._api_key = settings.api_key
-        self.client = openai.OpenAI(api_key=self._api_key)
+        http_client = _build_http_client(settings.http2)
+        if http_client is None:
+            if settings.http2:
+                renderer.display_info(
+                    "HTTP/2 was requested but the h2 package is not installed; "
+                    "using the default transport. "
+                    "Install it with: pip install 'httpx[http2]'"
+                )
+            self.client = openai.OpenAI(api_key=self._api_key)
+        else:
+            self.client = openai.OpenAI(api_key=self._api_key, http_client=http_client)
         self.show_reasoning = settings.show_reasoning
         self.reasoning_effort = settings.reasoning_effort
         self._debug_api = settings.debug_api
         self._debug_stream: TextIO = sys.stderr
         self._settings = settings
         self.mode = mode
+        self._tools_payload: Any = (
+            ORCHESTRA_TOOL_DEFINITIONS if mode == "orchestrator" else TOOL_DEFINITIONS
+        )
         self.orchestra_runtime = orchestra_runtime
         self.orchestra_scheduler = orchestra_scheduler
         self.jfdi_enabled: bool = False
         self.dog_whistle = (config.get("dog_whistle") or "jfdi").strip() or "jfdi"
+        self._dog_whistle_cf = self.dog_whistle.casefold()
+        self._dog_whistle_lower = self.dog_whistle.lower()
         self._seen_writes: set[tuple[str, str]] = set()
+        self._touched_paths: set[Path] = set()
+        self._tool_runtime: Optional[ToolRuntime] = None
+        self._scope_cache: dict[tuple[str, Path], tuple[Path, Path, str]] = {}
+        context_settings = config.get("context_settings", {})
+        self._context_max_bytes = int(
+            context_settings.get("max_bytes", MAX_READ_BYTES)
+        )
+        self._context_default_limit = int(
+            context_settings.get("read_limit", DEFAULT_READ_LIMIT)
+        )
+        self._stream_state = _StreamState()
+        self._sdk_sends_final_text = False
+        self._event_handlers: Dict[str, Callable[[Any, _StreamState], None]] = {
+            "response.reasoning_text.delta": partial(
+                self._on_reasoning_delta, suffix="text"
+            ),
+            "response.reasoning_summary_text.delta": partial(
+                self._on_reasoning_delta, suffix="summary"
+            ),
+            "response.reasoning_text.done": partial(
+                self._on_reasoning_done, suffix="text"
+            ),
+            "response.reasoning_summary_text.done": partial(
+                self._on_reasoning_done, suffix="summary"
+            ),
+            "response.reasoning_summary_part.added": self._on_reasoning_summary_part,
+            "response.reasoning_summary_part.done": self._on_reasoning_summary_part,
+            "response.completed": self._on_completed,
+            "response.output_text.delta": self._on_text_delta,
+            "response.output_text.done": self._on_text_done,
+            "response.function_call_arguments.delta": partial(
+                self._on_function_call_arguments, done=False
+            ),
+            "response.function_call_arguments.done": partial(
+                self._on_function_call_arguments, done=True
+            ),
+            "response.error": self._on_error,
+        }
 
     def _matches_dog_whistle(self, text: str) -> bool:
-        needle = self.dog_whistle.lower()
-        if not needle:
-            return False
-        return needle in text.lower()
+        return self._dog_whistle_cf in text.casefold()
 
     def _extract_instruction_after_dog_whistle(self, text: str) -> tuple[bool, str]:
-        phrase = self.dog_whistle.strip()
+        phrase = self.dog_whistle
         candidate = (text or "").strip()
-        if not phrase or not candidate:
+        if not candidate:
             return False, candidate
 
-        lower_candidate = candidate.lower()
-        lower_phrase = phrase.lower()
-        if not lower_candidate.startswith(lower_phrase):
+        if candidate[: len(phrase)].lower() != self._dog_whistle_lower:
             return False, candidate
 
         if len(candidate) > len(phrase):
@@ -92,8 +267,10 @@ class AIEngine:
         remainder = candidate[len(phrase) :].lstrip(" \t:,-")
         return True, remainder
 
-    def _api_debug(self, message: str) -> None:
+    def _api_debug(self, message: str, *args: Any) -> None:
         if self._debug_api:
+            if args:
+                message = message % args
             print(f"[openai-debug] {message}", file=self._debug_stream)
 
     def enable_api_debug(self, stream: TextIO) -> None:
@@ -114,6 +291,7 @@ class AIEngine:
 
         self.jfdi_enabled = False
         self._seen_writes.clear()
+        self._touched_paths.clear()
 
         dog_whistle_used, raw_prompt = self._extract_instruction_after_dog_whistle(
             raw_prompt
@@ -130,11 +308,8 @@ class AIEngine:
                 return 0
 
         repo_root = Path.cwd().resolve()
-        context_settings = self.config.get("context_settings", {})
-        context_max_bytes = int(context_settings.get("max_bytes", MAX_READ_BYTES))
-        context_default_limit = int(
-            context_settings.get("read_limit", DEFAULT_READ_LIMIT)
-        )
+        context_max_bytes = self._context_max_bytes
+        context_default_limit = self._context_default_limit
         include_listing = False
 
         try:
@@ -146,6 +321,7 @@ class AIEngine:
             self.renderer.display_error(str(exc))
             return 1
 
+        context_fingerprint = scope_fingerprint(scope_root)
         collected = collect_context(
             scope_root,
             limit_bytes=context_max_bytes,
@@ -165,48 +341,30 @@ class AIEngine:
         )
 
         dog_phrase = self.dog_whistle
-        if self.mode == "orchestrator":
-            system_prompt = textwrap.dedent(
-                f"""
-                You are Codex CLI in orchestrator mode. You may call orchestration tools to compose an ensemble,
-                set musician mandates, dispatch assignments, poll or wait, collect results, and synthesize a final answer.
-                Use first-principles thinking for each new user task and redefine mandates when task intent changes.
-                The human user interacts only with you (the orchestrator), not with musicians.
-                Treat `{dog_phrase}` as execution approval for mutating operations.
-                {scope_sentence}
-                """
-            ).strip()
-        else:
-            system_prompt = textwrap.dedent(
-                f"""
-                You are Codex CLI operating locally. You can call tools to read files, write files,
-                update plans, or execute sandboxed shell commands. IMPORTANT: when you need to
-                create or modify files you MUST call the `write` tool (alias: `write_file`) with the full content (not apply_patch). Do not
-                use shell globbing to list files; prefer the dedicated `glob` tool for pattern-based listings, use `search_content` instead of shell grep for searching text, and use the todo/plan tool (`plan_update`) when a structured checklist will help (multi-step work, explicit user requests, or when you need to show progress). Track tasks with the standard states (`pending`, `in_progress`, `completed`, `cancelled`) and keep at most one item `in_progress` at a time.
-                Treat the user command `{dog_phrase}` as "just fucking do it"—the user believes you have enough context, the plan looks good, and it is time to execute without further hesitations.
-                File edits, deletions, renames, and shell commands are blocked until the user types `{dog_phrase}` in this session. Purely read-only actions (reading files, globbing, searching) are always allowed. Mention `{dog_phrase}` only when you actually need approval—don’t repeat the reminder after you’ve delivered final results.
-                claim success unless the tool call succeeds. Maintain an explicit plan when useful
-                using `update_plan`. Always cite relevant files.
-                {scope_sentence}
-                """
-            ).strip()
+        template = (
+            _ORCHESTRATOR_PROMPT_TEMPLATE
+            if self.mode == "orchestrator"
+            else _SYSTEM_PROMPT_TEMPLATE
+        )
+        system_prompt = template.format(
+            dog_phrase=dog_phrase, scope_sentence=scope_sentence
+        )
 
         conversation_items: List[Dict[str, Any]] = []
         plan_state: Dict[str, Any] = {"plan": None}
         latest_instruction = raw_prompt
-        pending_lines = ["Repository snapshot:", prompt_context, ""]
-        if approval_note:
-            pending_lines.extend([approval_note, ""])
-        pending_lines.extend(
-            [
-                "Task:",
-                raw_prompt,
-                "",
-                "If files must change, call `write` (or `write_file`) with the full content.",
-            ]
+        approval_block = f"{approval_note}\n\n" if approval_note else ""
+        pending_user_message: Optional[str] = (
+            f"Repository snapshot:\n{prompt_context}\n\n{approval_block}"
+            f"Task:\n{raw_prompt}\n\n"
+            "If files must change, call `write` (or `write_file`) with the full content."
         )
-        pending_user_message: Optional[str] = "\n".join(pending_lines)
         pending_context_update: Optional[str] = None
+        superseded_snapshots: List[Dict[str, Any]] = []
+        superseded_snapshot_bytes = 0
+        last_snapshot_item: Optional[Dict[str, Any]] = None
+        gated_tool_calls: List[tuple[str, Any, str]] = []
+        gated_call_keys: set[tuple[str, str]] = set()
         context_dirty = False
         warned_no_write = False
         buffered_shell_messages: List[str] = []
@@ -216,55 +374,79 @@ class AIEngine:
         last_user_message_index: Optional[int] = None
         instruction_stack: list[str] = []
 
+        state = self._stream_state
         while True:
-            rendered_messages: set[str] = set()
+            state.reset()
             displayed_current_cycle = False
             if context_dirty:
-                collected = collect_context(
-                    scope_root,
-                    limit_bytes=context_max_bytes,
-                    default_limit=context_default_limit,
-                    include_listing=include_listing,
+                touched = [path.resolve() for path in self._touched_paths]
+                self._touched_paths.clear()
+                # Shell commands record the root itself: anything may have changed.
+                untracked = any(
+                    path == scope_root or path in scope_root.parents
+                    for path in touched
                 )
-                prompt_context = format_context_for_prompt(collected)
+                fingerprint = scope_fingerprint(scope_root)
+                # Unchanged top-level entries mean the snapshot text is too.
+                if not fingerprint or fingerprint != context_fingerprint:
+                    context_fingerprint = fingerprint
+                    if touched and not untracked and len(touched) <= MAX_REFRESH_PATHS:
+                        collected = refresh_paths(
+                            collected,
+                            touched,
+                            limit_bytes=context_max_bytes,
+                            default_limit=context_default_limit,
+                        )
+                    else:
+                        collected = collect_context(
+                            scope_root,
+                            limit_bytes=context_max_bytes,
+                            default_limit=context_default_limit,
+                            include_listing=include_listing,
+                        )
+                    prompt_context = format_context_for_prompt(collected)
                 pending_context_update = prompt_context
                 context_dirty = False
 
+            pending_items: List[Dict[str, Any]] = []
             if pending_context_update:
-                conversation_items.append(
-                    self._make_user_message(
-                        "Updated repository snapshot:\n" + pending_context_update
+                if last_snapshot_item is not None:
+                    superseded_snapshots.append(last_snapshot_item)
+                    superseded_snapshot_bytes += len(
+                        last_snapshot_item["content"][0]["text"].encode("utf-8")
                     )
+                # Rewriting sent items breaks the server's prompt-prefix cache,
+                # so stale snapshots are collapsed in one pass past a threshold.
+                if superseded_snapshot_bytes > SNAPSHOT_COMPACT_BYTES:
+                    for item in superseded_snapshots:
+                        item["content"][0]["text"] = SUPERSEDED_SNAPSHOT_TEXT
+                    superseded_snapshots.clear()
+                    superseded_snapshot_bytes = 0
+                last_snapshot_item = make_user_message(
+                    "Updated repository snapshot:\n" + pending_context_update
                 )
+                pending_items.append(last_snapshot_item)
                 pending_context_update = None
 
             if pending_user_message:
-                conversation_items.append(self._make_user_message(pending_user_message))
+                last_user_message_index = len(conversation_items) + len(pending_items)
+                pending_items.append(make_user_message(pending_user_message))
                 last_user_message_payload = pending_user_message
-                last_user_message_index = len(conversation_items) - 1
                 if not pending_user_is_repeat:
                     instruction_stack.append(latest_instruction)
                 pending_user_message = None
                 pending_user_is_repeat = False
 
-            conversation_payload = cast(Any, conversation_items)
-            tools = TOOL_DEFINITIONS
-            if self.mode == "orchestrator":
-                tools = ORCHESTRA_TOOL_DEFINITIONS
-            tools_payload = cast(Any, tools)
+            if pending_items:
+                conversation_items.extend(pending_items)
+
             tool_call_handled = False
             assistant_messages: list[tuple[str, Optional[str], str]] = []
-            assistant_stream_buffers: dict[str, str] = {}
-            assistant_stream_cache: dict[str, str] = {}
-            streamed_render_keys: set[str] = set()
-            previous_message: Optional[str] = None
-            pending_reasoning_queue: list[Dict[str, Any]] = []
 
             if skip_model_request:
                 skip_model_request = False
             else:
                 response = None
-                reasoning_buffers: dict[str, str] = {}
                 cancel_action: Optional[str] = None
 
                 try:
@@ -280,22 +462,33 @@ class AIEngine:
                         cast(Any, reasoning_payload) if reasoning_payload else None
                     )
                     self._api_debug(
-                        "stream request model=%s items=%d"
-                        % (model_id, len(conversation_items))
+                        "stream request model=%s items=%d",
+                        model_id,
+                        len(conversation_items),
                     )
 
+                    # Renderers without the flag are polled on every event.
+                    poll_always = not hasattr(self.renderer, "hotkey_pending")
+                    # Consumed synchronously on purpose: tool calls, review
+                    # prompts and rendering all block, and the next context
+                    # refresh depends on this response, so an async client
+                    # would have nothing to overlap with.
                     with self.client.responses.stream(
                         model=model_id,
                         instructions=system_prompt,
-                        input=conversation_payload,
-                        tools=tools_payload,
+                        input=cast(Any, conversation_items),
+                        tools=self._tools_payload,
                         tool_choice="auto",
                         reasoning=reasoning_arg,
                     ) as stream:
                         for event in stream:
                             if cancel_action:
                                 break
-                            hotkey_event = self.renderer.poll_hotkey_event()
+                            hotkey_event = (
+                                self.renderer.poll_hotkey_event()
+                                if poll_always or self.renderer.hotkey_pending
+                                else None
+                            )
                             while hotkey_event:
                                 if hotkey_event == "quit":
                                     cancel_action = "quit"
@@ -313,139 +506,41 @@ class AIEngine:
                             if cancel_action:
                                 break
                             event_type = getattr(event, "type", "")
-                            self._api_debug(f"event type={event_type}")
-
-                            if event_type in {
-                                "response.reasoning_text.delta",
-                                "response.reasoning_summary_text.delta",
-                            }:
-                                if not self.show_reasoning:
-                                    continue
-                                text = getattr(event, "delta", "")
-                                if not text:
-                                    continue
-                                suffix = (
-                                    "summary" if "summary" in event_type else "text"
-                                )
-                                part_key = self._reasoning_key(event, suffix=suffix)
-                                self._api_debug(
-                                    f"delta id={part_key} suffix={suffix} len={len(text)}"
-                                )
-                                if part_key not in reasoning_buffers:
-                                    reasoning_buffers[part_key] = ""
-                                    self.renderer.start_reasoning(part_key)
-                                reasoning_buffers[part_key] += text
-                                self.renderer.update_reasoning(part_key, text)
-                            elif event_type in {
-                                "response.reasoning_text.done",
-                                "response.reasoning_summary_text.done",
-                            }:
-                                if not self.show_reasoning:
-                                    continue
-                                suffix = (
-                                    "summary" if "summary" in event_type else "text"
-                                )
-                                part_key = self._reasoning_key(event, suffix=suffix)
-                                final_text = getattr(
-                                    event, "text", ""
-                                ) or reasoning_buffers.get(part_key, "")
-                                self._api_debug(
-                                    f"done id={part_key} suffix={suffix} len={len(final_text)}"
-                                )
-                                self.renderer.finish_reasoning(
-                                    part_key, final_text.strip() or None
-                                )
-                                reasoning_buffers.pop(part_key, None)
-                            elif event_type in {
-                                "response.reasoning_summary_part.added",
-                                "response.reasoning_summary_part.done",
-                            }:
-                                self._api_debug(
-                                    "event reasoning summary part received; skipping"
-                                )
-                                continue
-                            elif event_type == "response.completed":
-                                response = getattr(event, "response", None)
-                            elif event_type == "response.output_text.delta":
-                                delta = getattr(event, "delta", "")
-                                if not delta:
-                                    continue
-                                key = self._assistant_key(event)
-                                if key not in assistant_stream_buffers:
-                                    assistant_stream_buffers[key] = ""
-                                    self.renderer.start_assistant_stream(key)
-                                assistant_stream_buffers[key] += delta
-                                self.renderer.update_assistant_stream(key, delta)
-                                self._api_debug(
-                                    f"assistant delta id={key} len={len(delta)}"
-                                )
-                            elif event_type == "response.output_text.done":
-                                key = self._assistant_key(event)
-                                final_text = getattr(event, "text", "")
-                                buffer_text = assistant_stream_buffers.pop(key, "")
-                                stream_text = final_text or buffer_text
-                                self.renderer.finish_assistant_stream(key, stream_text)
-                                message_id = getattr(event, "item_id", None)
-                                cache_key = (
-                                    message_id if isinstance(message_id, str) else key
-                                )
-                                if stream_text:
-                                    assistant_stream_cache[cache_key] = stream_text
-                                streamed_render_keys.add(cache_key)
-                                self._api_debug(
-                                    f"assistant done id={key} len={len(stream_text)}"
-                                )
-                            elif event_type.startswith(
-                                "response.function_call_arguments."
+                            self._api_debug("event type=%s", event_type)
+
+                            if (
+                                state.pending_deltas
+                                and event_type != "response.output_text.delta"
                             ):
-                                delta = getattr(event, "delta", "")
-                                item_id = getattr(event, "item_id", None)
-                                name = getattr(event, "name", "")
-                                self._api_debug(
-                                    f"function_call event={event_type} item={item_id} name={name} len={len(delta) if isinstance(delta, str) else 0}"
-                                )
-                                if event_type.endswith(".done"):
-                                    response = getattr(event, "response", response)
-                            elif event_type == "response.error":
-                                message = getattr(event, "error", None)
-                                if message:
-                                    err_text = getattr(message, "message", str(message))
-                                    self.renderer.display_error(err_text)
-                                response = None
-                                break
+                                self._flush_assistant_deltas(state)
+                            handler = self._event_handlers.get(event_type)
+                            if handler is not None:
+                                handler(event, state)
+                                if state.stop:
+                                    break
 
+                    if state.pending_deltas:
+                        self._flush_assistant_deltas(state)
+                    response = state.response
                     if response is None:
                         response = getattr(stream, "response", None) or getattr(
                             stream, "final_response", None
                         )
                     self._api_debug(
-                        "stream exit status=%s"
-                        % (getattr(response, "status", None) if response else None)
+                        "stream exit status=%s",
+                        getattr(response, "status", None) if response else None,
                     )
 
                     if self.show_reasoning:
-                        for reasoning_id, text in list(reasoning_buffers.items()):
-                            self._api_debug(
-                                f"cleanup id={reasoning_id} len={len(text)}"
-                            )
-                            self.renderer.finish_reasoning(
-                                reasoning_id, text.strip() or None
-                            )
-                            reasoning_buffers.pop(reasoning_id, None)
+                        self._flush_reasoning_buffers(state)
                 except KeyboardInterrupt:
                     if self.show_reasoning:
-                        for reasoning_id, text in list(reasoning_buffers.items()):
-                            self.renderer.finish_reasoning(
-                                reasoning_id, text.strip() or None
-                            )
+                        self._flush_reasoning_buffers(state)
                     self.renderer.display_info("\nInterrupted by user.")
                     return 130
                 except Exception as exc:
                     if self.show_reasoning:
-                        for reasoning_id, text in list(reasoning_buffers.items()):
-                            self.renderer.finish_reasoning(
-                                reasoning_id, text.strip() or None
-                            )
+                        self._flush_reasoning_buffers(state)
                     self.renderer.display_error(f"Error: {exc}")
                     return 1
                 finally:
@@ -473,6 +568,8 @@ class AIEngine:
                     last_user_message_index = None
                     warned_no_write = False
                     self.jfdi_enabled = False
+                    gated_tool_calls.clear()
+                    gated_call_keys.clear()
                     self.renderer.display_info(
                         "Prompt cancelled. You can continue the conversation."
                     )
@@ -493,25 +590,27 @@ class AIEngine:
                             if getattr(block, "type", "").endswith("text"):
                                 text_parts.append(getattr(block, "text", ""))
                         text = "".join(text_parts).strip()
-                        pending_reasoning_queue.clear()
+                        state.pending_reasoning_queue.clear()
                         if text:
                             render_key = (
                                 raw_item_id
                                 if isinstance(raw_item_id, str)
                                 else self._assistant_message_key(item)
                             )
-                            cached_text = assistant_stream_cache.pop(render_key, None)
+                            cached_text = state.assistant_stream_cache.pop(render_key, None)
                             final_text = cached_text or text
                             assistant_messages.append(
                                 (final_text, raw_item_id, render_key)
                             )
                             if cached_text is not None:
-                                streamed_render_keys.add(render_key)
+                                state.streamed_render_keys.add(render_key)
                             self._api_debug(
-                                f"assistant message id={render_key} len={len(final_text)}"
+                                "assistant message id=%s len=%d",
+                                render_key,
+                                len(final_text),
                             )
                             conversation_items.append(
-                                self._make_assistant_message(final_text)
+                                make_assistant_message(final_text)
                             )
 
                     elif item_type in {"tool_call", "function_call"}:
@@ -521,10 +620,11 @@ class AIEngine:
                         tool_name = getattr(item, "name", "")
                         call_id = str(raw_call_id or f"tool-{tool_name}")
                         arguments_payload = item_payload.get("arguments", {})
-                        if pending_reasoning_queue:
-                            conversation_items.append(pending_reasoning_queue.pop(0))
-                        conversation_items.append(
-                            self._make_tool_call_item(
+                        call_items: List[Dict[str, Any]] = []
+                        if state.pending_reasoning_queue:
+                            call_items.append(state.pending_reasoning_queue.popleft())
+                        call_items.append(
+                            make_tool_call_item(
                                 call_id=call_id,
                                 tool_name=tool_name,
                                 arguments=arguments_payload,
@@ -539,10 +639,17 @@ class AIEngine:
                             plan_state=plan_state,
                             latest_instruction=latest_instruction,
                         )
-                        conversation_items.append(
-                            self._make_tool_result_message(call_id, result_text)
+                        call_items.append(
+                            make_tool_result_message(call_id, result_text)
                         )
+                        conversation_items.extend(call_items)
                         if result_text == JFDI_REQUIRED_MESSAGE:
+                            gated_key = (tool_name, str(arguments_payload))
+                            if gated_key not in gated_call_keys:
+                                gated_call_keys.add(gated_key)
+                                gated_tool_calls.append(
+                                    (tool_name, arguments_payload, call_id)
+                                )
                             self._inform_mutation_blocked(conversation_items)
                             tool_call_handled = True
                             continue
@@ -554,15 +661,14 @@ class AIEngine:
                         reasoning_payload = self._convert_response_item(item)
                         sanitized = {
                             key: value
-                            for key, value in reasoning_payload.items()
-                            if key in {"type", "id", "summary", "content"}
-                            and value is not None
+                            for key in _REASONING_KEEP
+                            if (value := reasoning_payload.get(key)) is not None
                         }
                         sanitized.setdefault("type", "reasoning")
-                        pending_reasoning_queue.append(sanitized)
+                        state.pending_reasoning_queue.append(sanitized)
                         # Summary is available via reasoning stream; avoid duplicate prints here.
 
-                pending_reasoning_queue.clear()
+                state.pending_reasoning_queue.clear()
             # end if not skip_model_request
 
             if tool_call_handled:
@@ -575,24 +681,20 @@ class AIEngine:
 
             for message_text, message_id, render_key in assistant_messages:
                 if (
-                    render_key not in rendered_messages
-                    and render_key not in streamed_render_keys
+                    render_key not in state.rendered_messages
+                    and render_key not in state.streamed_render_keys
                     and not displayed_current_cycle
                 ):
                     self.renderer.display_assistant_message(message_text)
-                    rendered_messages.add(render_key)
+                    state.rendered_messages.add(render_key)
                     displayed_current_cycle = True
-                previous_message = message_text
+                state.previous_message = message_text
                 if message_id == last_message_id:
                     continue
 
             if assistant_messages:
                 if not warned_no_write and any(
-                    re.search(
-                        r"\b(created|saved|written|added|generated)\b",
-                        msg_text,
-                        re.IGNORECASE,
-                    )
+                    _NO_WRITE_RE.search(msg_text)
                     for msg_text, _, _ in assistant_messages
                 ):
                     pending_user_message = "It appears no files changed. Please call the `write` tool (alias: `write_file`) with the full contents so the file can be created."
@@ -615,9 +717,27 @@ class AIEngine:
                     "Mutating tools enabled. Ready when you are."
                 )
                 if not follow_up:
+                    replay_note = ""
+                    if gated_tool_calls:
+                        # Run the calls that were blocked on approval now
+                        # instead of waiting for the model to re-issue them.
+                        if self._replay_gated_tool_calls(
+                            gated_tool_calls,
+                            conversation_items,
+                            base_root=repo_root,
+                            default_root=scope_root if scope else repo_root,
+                            plan_state=plan_state,
+                            latest_instruction=latest_instruction,
+                        ):
+                            context_dirty = True
+                        gated_call_keys.clear()
+                        replay_note = (
+                            " The tool calls that were blocked pending approval"
+                            " have been executed; their results are above."
+                        )
                     pending_user_message = (
                         "Follow-up instruction:\n"
-                        f"User typed `{self.dog_whistle}`, signaling approval to execute the existing plan. Proceed accordingly."
+                        f"User typed `{self.dog_whistle}`, signaling approval to execute the existing plan.{replay_note} Proceed accordingly."
                     )
                     latest_instruction = "jfdi approval"
                     pending_user_is_repeat = False
@@ -629,8 +749,11 @@ class AIEngine:
                 )
             if follow_up == NEW_CONVERSATION_TOKEN:
                 self._api_debug("conversation reset requested")
+                self._scope_cache.clear()
                 conversation_items.clear()
-                pending_reasoning_queue.clear()
+                gated_tool_calls.clear()
+                gated_call_keys.clear()
+                state.pending_reasoning_queue.clear()
                 assistant_messages.clear()
                 buffered_shell_messages.clear()
                 plan_state["plan"] = None
@@ -658,7 +781,7 @@ class AIEngine:
                     continue
 
                 try:
-                    self._api_debug(f"shell command={command_text}")
+                    self._api_debug("shell command=%s", command_text)
                     result = run_sandboxed_bash(
                         command_text,
                         cwd=scope_root if scope else repo_root,
@@ -666,22 +789,26 @@ class AIEngine:
                         timeout=30,
                         max_output_bytes=20000,
                     )
+                    # No path list: the next refresh re-collects everything.
+                    self._touched_paths.add(repo_root)
                     formatted = format_command_result(result)
                     self._api_debug(
-                        f"shell result len={len(formatted)} truncated={formatted[:120]!r}"
+                        "shell result len=%d truncated=%r",
+                        len(formatted),
+                        formatted[:120],
                     )
-                    if formatted.strip():
+                    has_output = bool(formatted) and not formatted.isspace()
+                    if has_output:
                         self.renderer.display_shell_output(formatted)
-                    preview_message = (
-                        "Executed shell command: `"
-                        + command_text
-                        + "`\n"
-                        + (
-                            "Output:\n```\n" + formatted + "\n```"
-                            if formatted.strip()
-                            else "Output: (no stdout)"
+                        preview_message = (
+                            f"Executed shell command: `{command_text}`\n"
+                            f"Output:\n```\n{formatted}\n```"
+                        )
+                    else:
+                        preview_message = (
+                            f"Executed shell command: `{command_text}`\n"
+                            "Output: (no stdout)"
                         )
-                    )
                     buffered_shell_messages.append(preview_message)
                     skip_model_request = True
                 except CommandRejected as exc:
@@ -691,18 +818,25 @@ class AIEngine:
                 continue
 
             warned_no_write = False
+            gated_tool_calls.clear()
+            gated_call_keys.clear()
 
             latest_instruction = follow_up
+            # A burst of shell commands (or completions) goes out as one user
+            # message rather than one framed message per entry.
             if buffered_shell_messages:
-                for msg in buffered_shell_messages:
-                    conversation_items.append(self._make_user_message(msg))
+                conversation_items.append(
+                    make_user_message("\n\n".join(buffered_shell_messages))
+                )
                 buffered_shell_messages.clear()
-            for completion_msg in self.renderer.consume_completion_messages():
-                conversation_items.append(self._make_user_message(completion_msg))
+            completion_messages = self.renderer.consume_completion_messages()
+            if completion_messages:
+                conversation_items.append(
+                    make_user_message("\n\n".join(completion_messages))
+                )
             pending_user_message = (
-                "Follow-up instruction:\n"
-                + follow_up
-                + "\n\nReminder: use the `write` tool (or `write_file`) with full file contents when files must change."
+                f"Follow-up instruction:\n{follow_up}\n\n"
+                "Reminder: use the `write` tool (or `write_file`) with full file contents when files must change."
             )
             pending_user_is_repeat = False
 
@@ -725,9 +859,7 @@ class AIEngine:
             return 1
 
         try:
-            current_text = (
-                target_path.read_text(encoding="utf-8") if target_path.exists() else ""
-            )
+            current_text = read_utf8_text(target_path)
         except UnicodeDecodeError:
             self.renderer.display_info(f"{target_path} isn't UTF-8 text.")
             return 1
@@ -742,44 +874,85 @@ class AIEngine:
             "You rewrite files. Return only the complete updated file content. "
             "No explanations, no code fences, no commentary."
         )
-        user_message = (
+        # The file text travels as its own content part so it is never copied
+        # into one large concatenated prompt string.
+        user_prefix = (
             f"File: {target_path}\n"
             "Instruction:\n"
             f"{instruction}\n\n"
             "Original file contents:\n"
-            f"{current_text}"
         )
 
         self.renderer.start_loader()
         content = ""
         self._api_debug(
-            f"edit request model={effective_model} path={target_path} instruction_len={len(instruction)}"
+            "edit request model=%s path=%s instruction_len=%d",
+            effective_model,
+            target_path,
+            len(instruction),
         )
 
+        chunks: List[str] = []
         try:
             if self._is_responses_model(effective_model):
-                response = self.client.responses.create(  # type: ignore[arg-type]
+                with self.client.responses.stream(  # type: ignore[arg-type]
                     model=effective_model,
-                    input=f"{system_message}\n\n{user_message}",
-                )
-                content = self._coalesce_responses_text(response)
-                self._api_debug(
-                    f"edit response status={getattr(response, 'status', None)} output_len={len(content)}"
-                )
+                    input=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "input_text",
+                                    "text": f"{system_message}\n\n{user_prefix}",
+                                },
+                                {"type": "input_text", "text": current_text},
+                            ],
+                        }
+                    ],
+                ) as stream:
+                    for event in stream:
+                        if getattr(event, "type", "") == "response.output_text.delta":
+                            chunks.append(getattr(event, "delta", "") or "")
+                    response = getattr(stream, "response", None) or getattr(
+                        stream, "final_response", None
+                    )
+                content = "".join(chunks)
+                if not content and response is not None:
+                    content = self._coalesce_responses_text(response)
+                if self._debug_api:
+                    self._api_debug(
+                        "edit response status=%s output_len=%d",
+                        getattr(response, "status", None),
+                        len(content),
+                    )
             else:
-                chat_response = self.client.chat.completions.create(
+                chunk_count = 0
+                for chunk in self.client.chat.completions.create(
                     model=effective_model,
                     messages=[
                         {"role": "system", "content": system_message},
-                        {"role": "user", "content": user_message},
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": user_prefix},
+                                {"type": "text", "text": current_text},
+                            ],
+                        },
                     ],
-                )
-                if chat_response.choices:
-                    choice = chat_response.choices[0]
-                    content_obj = getattr(choice.message, "content", None)
-                    content = content_obj if isinstance(content_obj, str) else ""
+                    stream=True,
+                ):
+                    chunk_count += 1
+                    choices = getattr(chunk, "choices", None)
+                    if not choices:
+                        continue
+                    delta = getattr(choices[0].delta, "content", None)
+                    if isinstance(delta, str):
+                        chunks.append(delta)
+                content = "".join(chunks)
                 self._api_debug(
-                    f"edit response chat choices={len(chat_response.choices) if hasattr(chat_response, 'choices') else 0} output_len={len(content)}"
+                    "edit response chat chunks=%d output_len=%d",
+                    chunk_count,
+                    len(content),
                 )
         except Exception as exc:
             self.renderer.display_error(f"Error: {exc}. The API tripped over itself.")
@@ -817,7 +990,7 @@ class AIEngine:
         )
 
         if status == "delete_requested":
-            delete_status = self._delete_path_via_shell(target_path, Path.cwd())
+            delete_status = self._delete_path(target_path, Path.cwd())
             if delete_status.startswith("error"):
                 self.renderer.display_error(delete_status)
                 return 1
@@ -838,6 +1011,30 @@ class AIEngine:
     def _render_mutation_blocked(self) -> None:
         self.renderer.display_assistant_message(self._mutation_blocked_message())
 
+    def _replay_gated_tool_calls(
+        self,
+        gated_calls: List[tuple[str, Any, str]],
+        conversation_items: List[Dict[str, Any]],
+        **tool_kwargs: Any,
+    ) -> bool:
+        mutated_any = False
+        for tool_name, arguments, call_id in gated_calls:
+            replay_id = f"{call_id}-approved"
+            result_text, mutated = self._handle_tool_call(
+                tool_name, arguments, **tool_kwargs
+            )
+            conversation_items.extend(
+                (
+                    make_tool_call_item(
+                        call_id=replay_id, tool_name=tool_name, arguments=arguments
+                    ),
+                    make_tool_result_message(replay_id, result_text),
+                )
+            )
+            mutated_any = mutated_any or mutated
+        gated_calls.clear()
+        return mutated_any
+
     def _inform_mutation_blocked(
         self, conversation_items: List[Dict[str, Any]]
     ) -> None:
@@ -849,12 +1046,19 @@ class AIEngine:
             or not conversation_items[-1].get("content")
             or conversation_items[-1]["content"][0].get("text") != message
         ):
-            conversation_items.append(self._make_assistant_message(message))
+            conversation_items.append(make_assistant_message(message))
 
     def _resolve_scope(self, scope: Optional[str], repo_root: Path) -> tuple[Path, str]:
         if not scope:
             return repo_root, "repository root"
 
+        cached = self._scope_cache.get((scope, repo_root))
+        if cached is not None:
+            candidate, root, label = cached
+            if candidate.exists():
+                return root, label
+            del self._scope_cache[(scope, repo_root)]
+
         candidate = Path(scope).expanduser()
         candidate = (
             (repo_root / candidate).resolve()
@@ -862,19 +1066,26 @@ class AIEngine:
             else candidate.resolve()
         )
 
-        try:
-            candidate.relative_to(repo_root)
-        except ValueError as exc:
-            raise ValueError("Scope path must be inside the repository") from exc
-
-        if not candidate.exists():
-            raise FileNotFoundError(candidate)
+        candidate_str = os.fspath(candidate)
+        root_str = os.fspath(repo_root)
+        if candidate_str != root_str and not candidate_str.startswith(
+            root_str.rstrip(os.sep) + os.sep
+        ):
+            raise ValueError("Scope path must be inside the repository")
+        relative = str(candidate.relative_to(repo_root))
 
-        if candidate.is_dir():
-            label = str(candidate.relative_to(repo_root)) or "."
-            return candidate, label
+        # One stat answers both "exists" and "is a directory".
+        try:
+            mode = candidate.stat().st_mode
+        except OSError:
+            raise FileNotFoundError(candidate) from None
 
-        return candidate.parent, str(candidate.relative_to(repo_root))
+        if stat.S_ISDIR(mode):
+            resolved = (candidate, relative or ".")
+        else:
+            resolved = (candidate.parent, relative)
+        self._scope_cache[(scope, repo_root)] = (candidate, *resolved)
+        return resolved
 
     def _build_tool_runtime(
         self,
@@ -884,16 +1095,30 @@ class AIEngine:
         plan_state: Dict[str, Any],
         latest_instruction: str,
     ) -> ToolRuntime:
-        return ToolRuntime(
-            renderer=self.renderer,
-            base_root=base_root,
-            default_root=default_root,
-            plan_state=plan_state,
-            latest_instruction=latest_instruction,
-            jfdi_enabled=self.jfdi_enabled,
-            seen_writes=self._seen_writes,
-            debug=self._api_debug,
-        )
+        # Tool calls run one at a time, so a single runtime per root pair is
+        # reused and only the per-call fields are refreshed.
+        runtime = self._tool_runtime
+        if (
+            runtime is None
+            or runtime.base_root != base_root
+            or runtime.default_root != default_root
+        ):
+            runtime = self._tool_runtime = ToolRuntime(
+                renderer=self.renderer,
+                base_root=base_root,
+                default_root=default_root,
+                plan_state=plan_state,
+                latest_instruction=latest_instruction,
+                jfdi_enabled=self.jfdi_enabled,
+                seen_writes=self._seen_writes,
+                touched_paths=self._touched_paths,
+                debug=self._api_debug,
+            )
+            return runtime
+        runtime.plan_state = plan_state
+        runtime.latest_instruction = latest_instruction
+        runtime.jfdi_enabled = self.jfdi_enabled
+        return runtime
 
     def _apply_file_update(
         self,
@@ -917,14 +1142,14 @@ class AIEngine:
             auto_apply=auto_apply,
         )
 
-    def _delete_path_via_shell(self, path: Path, base_root: Path) -> str:
+    def _delete_path(self, path: Path, base_root: Path) -> str:
         runtime = self._build_tool_runtime(
             base_root=base_root,
             default_root=base_root,
             plan_state={},
             latest_instruction="",
         )
-        return delete_path_via_shell(path, runtime)
+        return delete_path(path, runtime)
 
     def _handle_tool_call(
         self,
@@ -974,21 +1199,143 @@ class AIEngine:
     def _instruction_implies_write(self, text: str) -> bool:
         return instruction_implies_write(text)
 
+    def _on_reasoning_delta(
+        self, event: Any, state: _StreamState, *, suffix: str
+    ) -> None:
+        if not self.show_reasoning:
+            return
+        text = getattr(event, "delta", "")
+        if not text:
+            return
+        part_key = self._reasoning_key(event, suffix=suffix)
+        self._api_debug("delta id=%s suffix=%s len=%d", part_key, suffix, len(text))
+        parts = state.reasoning_buffers.get(part_key)
+        if parts is None:
+            parts = state.reasoning_buffers[part_key] = []
+            self.renderer.start_reasoning(part_key)
+        parts.append(text)
+        self.renderer.update_reasoning(part_key, text)
+
+    def _on_reasoning_done(
+        self, event: Any, state: _StreamState, *, suffix: str
+    ) -> None:
+        if not self.show_reasoning:
+            return
+        part_key = self._reasoning_key(event, suffix=suffix)
+        final_text = getattr(event, "text", "") or "".join(
+            state.reasoning_buffers.get(part_key, ())
+        )
+        self._api_debug(
+            "done id=%s suffix=%s len=%d", part_key, suffix, len(final_text)
+        )
+        self.renderer.finish_reasoning(part_key, final_text.strip() or None)
+        state.reasoning_buffers.pop(part_key, None)
+
+    def _on_reasoning_summary_part(self, event: Any, state: _StreamState) -> None:
+        self._api_debug("event reasoning summary part received; skipping")
+
+    def _on_completed(self, event: Any, state: _StreamState) -> None:
+        state.response = getattr(event, "response", None)
+
+    def _on_text_delta(self, event: Any, state: _StreamState) -> None:
+        delta = getattr(event, "delta", "")
+        if not delta:
+            return
+        key = self._assistant_key(event)
+        parts = state.assistant_stream_buffers.get(key)
+        if parts is None:
+            parts = state.assistant_stream_buffers[key] = []
+            self.renderer.start_assistant_stream(key)
+            state.delta_deadline_ns = time.monotonic_ns() + STREAM_COALESCE_NS
+            self.renderer.update_assistant_stream(key, delta)
+        else:
+            state.pending_deltas.setdefault(key, []).append(delta)
+            if time.monotonic_ns() >= state.delta_deadline_ns:
+                self._flush_assistant_deltas(state)
+        if not self._sdk_sends_final_text:
+            parts.append(delta)
+        self._api_debug("assistant delta id=%s len=%d", key, len(delta))
+
+    def _flush_assistant_deltas(self, state: _StreamState) -> None:
+        for key, chunks in state.pending_deltas.items():
+            self.renderer.update_assistant_stream(key, "".join(chunks))
+        state.pending_deltas.clear()
+        state.delta_deadline_ns = time.monotonic_ns() + STREAM_COALESCE_NS
+
+    def _on_text_done(self, event: Any, state: _StreamState) -> None:
+        key = self._assistant_key(event)
+        final_text = getattr(event, "text", "")
+        buffer_text = "".join(state.assistant_stream_buffers.pop(key, ()))
+        # Once the SDK has shown it sends the full text on .done, deltas are
+        # only forwarded to the renderer; a .done without text re-enables
+        # buffering for the next message.
+        self._sdk_sends_final_text = bool(final_text)
+        stream_text = final_text or buffer_text
+        self.renderer.finish_assistant_stream(key, stream_text)
+        message_id = getattr(event, "item_id", None)
+        cache_key = message_id if isinstance(message_id, str) else key
+        if stream_text:
+            state.assistant_stream_cache[cache_key] = stream_text
+        state.streamed_render_keys.add(cache_key)
+        self._api_debug("assistant done id=%s len=%d", key, len(stream_text))
+
+    def _on_function_call_arguments(
+        self, event: Any, state: _StreamState, *, done: bool
+    ) -> None:
+        if self._debug_api:
+            delta = getattr(event, "delta", "")
+            self._api_debug(
+                "function_call event=%s item=%s name=%s len=%d",
+                getattr(event, "type", ""),
+                getattr(event, "item_id", None),
+                getattr(event, "name", ""),
+                len(delta) if isinstance(delta, str) else 0,
+            )
+        if done:
+            state.response = getattr(event, "response", state.response)
+
+    def _on_error(self, event: Any, state: _StreamState) -> None:
+        message = getattr(event, "error", None)
+        if message:
+            err_text = getattr(message, "message", str(message))
+            self.renderer.display_error(err_text)
+        state.response = None
+        state.stop = True
+
+    def _flush_reasoning_buffers(self, state: _StreamState) -> None:
+        for reasoning_id, parts in state.reasoning_buffers.items():
+            text = "".join(parts)
+            self._api_debug("cleanup id=%s len=%d", reasoning_id, len(text))
+            self.renderer.finish_reasoning(reasoning_id, text.strip() or None)
+        state.reasoning_buffers.clear()
+
     def _reasoning_key(self, event: Any, suffix: str = "text") -> str:
-        item_id = getattr(event, "item_id", "reasoning")
         if suffix == "summary":
-            index = getattr(event, "summary_index", getattr(event, "output_index", 0))
-            label = "summary"
-        else:
-            index = getattr(event, "content_index", getattr(event, "output_index", 0))
-            label = "text"
-        return f"{item_id}:{label}:{index}"
+            try:
+                item_id, index = _SUMMARY_KEY_ATTRS(event)
+            except AttributeError:
+                item_id = getattr(event, "item_id", "reasoning")
+                index = getattr(
+                    event, "summary_index", getattr(event, "output_index", 0)
+                )
+            return f"{item_id}:summary:{index}"
+        try:
+            item_id, index = _CONTENT_KEY_ATTRS(event)
+        except AttributeError:
+            item_id = getattr(event, "item_id", "reasoning")
+            index = getattr(
+                event, "content_index", getattr(event, "output_index", 0)
+            )
+        return f"{item_id}:text:{index}"
 
     def _assistant_key(self, event: Any) -> str:
-        item_id = getattr(event, "item_id", "assistant")
-        content_index = getattr(
-            event, "content_index", getattr(event, "output_index", 0)
-        )
+        try:
+            item_id, content_index = _CONTENT_KEY_ATTRS(event)
+        except AttributeError:
+            item_id = getattr(event, "item_id", "assistant")
+            content_index = getattr(
+                event, "content_index", getattr(event, "output_index", 0)
+            )
         return f"{item_id}:{content_index}"
 
     def _assistant_message_key(self, item: Any) -> str:
@@ -1002,6 +1349,17 @@ class AIEngine:
             text = getattr(response, "output_text")
             if isinstance(text, str) and text.strip():
                 return text
+        # Read the SDK objects in place first; dumping the whole response tree
+        # through pydantic is only worth it for shapes this walk doesn't know.
+        chunks: List[str] = []
+        for item in getattr(response, "output", None) or ():
+            for part in getattr(item, "content", None) or ():
+                part_text = getattr(part, "text", None)
+                if isinstance(part_text, str):
+                    chunks.append(part_text)
+        direct = "".join(chunks).strip()
+        if direct:
+            return direct
         if hasattr(response, "model_dump"):
             data = response.model_dump()
         elif hasattr(response, "dict"):
@@ -1009,30 +1367,7 @@ class AIEngine:
         else:
             data = response
 
-        def _from_output(obj: Any) -> str:
-            content_chunks: List[str] = []
-            if isinstance(obj, dict):
-                output = obj.get("output") or obj.get("choices") or obj.get("content")
-                if isinstance(output, list):
-                    for item in output:
-                        text = _from_output(item)
-                        if text:
-                            content_chunks.append(text)
-                elif isinstance(output, dict):
-                    text = _from_output(output)
-                    if text:
-                        content_chunks.append(text)
-                text_value = obj.get("text")
-                if isinstance(text_value, str):
-                    content_chunks.append(text_value)
-                return "".join(content_chunks)
-            if isinstance(obj, list):
-                return "".join(_from_output(item) for item in obj)
-            if isinstance(obj, str):
-                return obj
-            return ""
-
-        return _from_output(data).strip()
+        return _collect_output_text(data).strip()
 
     def _strip_code_fence(self, raw_response: str) -> str:
         text = (raw_response or "").strip()
@@ -1040,9 +1375,11 @@ class AIEngine:
             fence_break = text.find("\n")
             if fence_break == -1:
                 return ""
-            text = text[fence_break + 1 :]
-            text = text.rsplit("```", 1)[0]
-        return text.replace("\r\n", "\n").strip("\n")
+            closing = text.rfind("```", fence_break + 1)
+            text = text[fence_break + 1 : closing if closing != -1 else None]
+        if "\r" in text:
+            text = text.replace("\r\n", "\n")
+        return text.strip("\n")
 
     def _convert_response_item(self, obj: Any) -> Dict[str, Any]:
         data = self._to_plain_data(obj)
@@ -1053,53 +1390,5 @@ class AIEngine:
         )
 
     def _to_plain_data(self, obj: Any) -> Any:
-        if isinstance(obj, (str, int, float, bool)) or obj is None:
-            return obj
-        if isinstance(obj, dict):
-            return {key: self._to_plain_data(value) for key, value in obj.items()}
-        if isinstance(obj, (list, tuple, set)):
-            return [self._to_plain_data(value) for value in obj]
-        if hasattr(obj, "model_dump"):
-            return self._to_plain_data(obj.model_dump())
-        if hasattr(obj, "dict"):
-            return self._to_plain_data(obj.dict())
-        try:
-            iterable = iter(obj)  # type: ignore[arg-type]
-        except TypeError:
-            return str(obj)
-        else:
-            return [self._to_plain_data(item) for item in iterable]
-
-    def _make_user_message(self, text: str) -> Dict[str, Any]:
-        return {"role": "user", "content": [{"type": "input_text", "text": text}]}
-
-    def _make_assistant_message(self, text: str) -> Dict[str, Any]:
-        return {"role": "assistant", "content": [{"type": "output_text", "text": text}]}
-
-    def _make_tool_result_message(self, call_id: str, text: str) -> Dict[str, Any]:
-        return {
-            "type": "function_call_output",
-            "call_id": call_id,
-            "output": text,
-        }
+        return to_plain_data(obj)
 
-    def _make_tool_call_item(
-        self,
-        *,
-        call_id: str,
-        tool_name: str,
-        arguments: Any,
-        raw_id: Any = None,
-    ) -> Dict[str, Any]:
-        serialized_arguments = (
-            arguments if isinstance(arguments, str) else json.dumps(arguments or {})
-        )
-        item: Dict[str, Any] = {
-            "type": "function_call",
-            "call_id": call_id,
-            "name": tool_name,
-            "arguments": serialized_arguments,
-        }
-        if raw_id is not None:
-            item["id"] = str(raw_id)
-        return item
@@ -1,17 +1,51 @@
+"""Tool definitions and handlers for the engine's function-calling loop.
+
+Performance notes:
+- Regex patterns used on assistant and user text are compiled once at module
+  load; ``detect_generated_files`` bails out before scanning when the message
+  has no fence pair.
+- These helpers are pure string work, so JIT compilers such as Numba do not
+  help (they fall back to object mode); prefer tightening the regexes.
+  Ahead-of-time compilers (mypyc, Cython) gain little for the same reason:
+  the time goes to ``re`` and ``str`` methods that already run in C, and the
+  release is a plain PyInstaller bundle with no extension build step.
+- ``TOOL_DEFINITIONS`` stays a plain list: the OpenAI client encodes the whole
+  request body itself, so a pre-serialized blob could not be spliced in.
+  Callers pass the same list object on every request rather than copies.
+- Handlers are synchronous on purpose. Tool calls in one response run in the
+  order the model issued them: later calls may read what earlier ones wrote,
+  and shell, patch and write calls can stop for a confirmation prompt. The
+  engine only overlaps work that is independent, such as per-file edit
+  requests.
+"""
+
 from __future__ import annotations
 
+import copy
 import json
 import os
 import re
 import shlex
+import stat
 import subprocess
 import fnmatch
 from dataclasses import dataclass, field
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Protocol, TextIO
+from typing import Any, Callable, Dict, Iterator, List, Optional, Protocol, TextIO
 
 from bash_executor import CommandRejected, format_command_result, run_sandboxed_bash
 
+try:  # Optional linear-time engine for the Python search_content fallback
+    import re2 as _re2
+except ImportError:  # pragma: no cover - google-re2 is not a requirement
+    _re2 = None
+
+try:  # Optional faster decoder for rg's JSON lines
+    from orjson import loads as _loads_json
+except ImportError:  # pragma: no cover - orjson is not a requirement
+    _loads_json = json.loads
+
 
 TOOL_DEFINITIONS = [
     {
@@ -190,7 +224,7 @@ TOOL_DEFINITIONS = [
                 "extraArgs": {
                     "type": "array",
                     "items": {"type": "string"},
-                    "description": "Additional pytest arguments",
+                    "description": "Additional pytest arguments (for example [\"-n\", \"auto\"] to spread tests across CPUs when the project has pytest-xdist installed)",
                 },
                 "timeout_ms": {
                     "type": "integer",
@@ -471,9 +505,71 @@ DEFAULT_SEARCH_EXCLUDES = [
     "**/ruff_cache/**",
 ]
 
+_RG_COMMAND = shlex.join(["rg", "--json", "--line-number", "--color", "never"])
+_RG_DEFAULT_EXCLUDES = shlex.join(
+    [arg for pattern in DEFAULT_SEARCH_EXCLUDES for arg in ("-g", f"!{pattern}")]
+)
+
 JFDI_REQUIRED_MESSAGE = "blocked: jfdi approval required"
 
 
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.environ.get(name, str(default))))
+    except (TypeError, ValueError):
+        return default
+
+
+# Shell limits come from the process environment, which does not change while
+# the CLI runs; read them once instead of on every shell call.
+_SHELL_MAX_SECONDS = _env_int("AI_BASH_MAX_SECONDS", 15)
+_SHELL_MAX_OUTPUT = _env_int("AI_BASH_MAX_OUTPUT", 20000)
+
+_GENERATED_FILE_RE = re.compile(
+    r"(?P<fence>^```)"
+    r"|(?:save|write|create|add|generate|produce)[^\n]{0,160}?\b(?:as|to|in)[^\S\n]+`?(?P<filename>[A-Za-z0-9._\-/]+)`?(?::)?",
+    re.IGNORECASE | re.ASCII | re.MULTILINE,
+)
+_HUNK_HEADER_RE = re.compile(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+# instruction_implies_write patterns, compiled once at import.
+_WRITE_TOOL_RE = re.compile(r"write_file|apply_patch", re.IGNORECASE)
+# Verbs are matched as whole \w+ tokens against a set, which beats walking a
+# 19-way alternation at every character of long instructions.
+_WRITE_VERBS = frozenset(
+    {
+        "write",
+        "edit",
+        "modify",
+        "refactor",
+        "patch",
+        "update",
+        "save",
+        "append",
+        "delete",
+        "remove",
+        "rename",
+        "implement",
+        "create",
+        "add",
+        "generate",
+        "produce",
+        "make",
+        "build",
+        "draft",
+    }
+)
+_WORD_RE = re.compile(r"\w+")
+_PATH_HINT_RE = re.compile(
+    r"`[^`]+`|\b[A-Za-z0-9_./-]+\.(?:py|md|txt|json|yaml|yml|toml|ini|sh|js|ts|tsx"
+    r"|jsx|rs|go|java|c|cpp|h)\b",
+    re.IGNORECASE,
+)
+_CONTEXT_WORD_RE = re.compile(
+    r"\b(?:file|files|code|repo|repository|module|script|readme)\b", re.IGNORECASE
+)
+
+
 class RendererProtocol(Protocol):
     def display_info(self, text: str) -> None: ...
 
@@ -536,7 +632,7 @@ class RendererProtocol(Protocol):
     def poll_hotkey_event(self) -> Optional[str]: ...
 
 
-@dataclass
+@dataclass(slots=True)
 class ToolRuntime:
     renderer: RendererProtocol
     base_root: Path
@@ -546,222 +642,429 @@ class ToolRuntime:
     jfdi_enabled: bool
     seen_writes: set[tuple[str, str]]
     debug: Callable[[str], None] = field(default=lambda _msg: None)
+    touched_paths: set[Path] = field(default_factory=set)
 
 
 def instruction_implies_write(text: str) -> bool:
-    normalized = text.lower()
-    path_hint = bool(
-        re.search(
-            r"(`[^`]+`|\b[A-Za-z0-9_./-]+\.(?:py|md|txt|json|yaml|yml|toml|ini|sh|js|ts|tsx|jsx|rs|go|java|c|cpp|h)\b)",
-            normalized,
-        )
-    )
-    context_hint = path_hint or bool(
-        re.search(r"\b(file|files|code|repo|repository|module|script|readme)\b", normalized)
-    )
+    if _WRITE_TOOL_RE.search(text):
+        return True
+    # lower() + findall are single C passes and the set check is a hash probe
+    # per word; on 100 KiB prompts this beats an IGNORECASE alternation and
+    # a per-match Python loop, so no automaton library is needed.
+    if _WRITE_VERBS.isdisjoint(_WORD_RE.findall(text.lower())):
+        return False
+    return bool(_PATH_HINT_RE.search(text) or _CONTEXT_WORD_RE.search(text))
 
-    strong_verbs = bool(
-        re.search(
-            r"\b(write|edit|modify|refactor|patch|update|save|append|delete|remove|rename|implement)\b",
-            normalized,
-        )
-    )
-    weak_verbs = bool(
-        re.search(r"\b(create|add|generate|produce|make|build|draft)\b", normalized)
-    )
 
-    if "write_file" in normalized or "apply_patch" in normalized:
-        return True
-    if strong_verbs and context_hint:
-        return True
-    if weak_verbs and context_hint:
-        return True
-    return False
+def _find_fence_line(text: str, pos: int) -> int:
+    # str.find is a C-level substring search; only fences that start a line
+    # count, so skip inline ``` hits.
+    index = text.find("```", pos)
+    if index > 0 and text[index - 1] != "\n":
+        index = text.find("\n```", index)
+        return index + 1 if index != -1 else -1
+    return index
 
 
 def detect_generated_files(message: str) -> List[tuple[str, str]]:
-    pattern = re.compile(
-        r"(?:save|write|create|add|generate|produce)[^\n]{0,160}?\b(?:as|to|in)\s+`?([A-Za-z0-9._\-/]+)`?(?::)?",
-        re.IGNORECASE,
-    )
-    lines = message.replace("**", "").splitlines()
-    i = 0
+    cleaned = message.replace("**", "")
+    # A generated file needs an opening and a closing fence; bail out before
+    # scanning large messages that cannot contain one.
+    if cleaned.count("```") < 2:
+        return []
     results: List[tuple[str, str]] = []
-    while i < len(lines):
-        match = pattern.search(lines[i])
-        if not match:
-            i += 1
-            continue
-
-        filename = match.group(1).strip().rstrip(":").strip()
-        j = i + 1
-        while j < len(lines) and not lines[j].startswith("```"):
-            j += 1
-        if j >= len(lines):
-            i += 1
+    pos = 0
+    # The combined pattern only looks for the next filename line; once armed,
+    # _find_fence_line jumps to the opening and closing fences so the body is
+    # never run through the filename alternation.
+    while True:
+        match = _GENERATED_FILE_RE.search(cleaned, pos)
+        if match is None:
+            break
+        if match.group("fence") is not None:
+            pos = match.end()
             continue
-        j += 1
-        start = j
-        while j < len(lines) and not lines[j].startswith("```"):
-            j += 1
-        if j >= len(lines):
+        filename = match.group("filename").strip().rstrip(":").strip()
+        opening = _find_fence_line(cleaned, match.end())
+        if opening == -1:
+            break
+        line_end = cleaned.find("\n", opening + 3)
+        if line_end == -1:
+            break
+        body_start = line_end + 1
+        closing = _find_fence_line(cleaned, body_start)
+        if closing == -1:
             break
-        content = "\n".join(lines[start:j]).rstrip()
-        results.append((filename, content))
-        i = j + 1
+        results.append((filename, cleaned[body_start:closing].rstrip()))
+        line_end = cleaned.find("\n", closing + 3)
+        if line_end == -1:
+            break
+        pos = line_end + 1
     return results
 
 
+def resolve_tool_path(default_root: Path, raw: str) -> Path:
+    # Not cached: the result gates the project-root check, and symlinks can be
+    # retargeted by other processes at any time.
+    path = Path(raw)
+    return (default_root / path).resolve() if not path.is_absolute() else path.resolve()
+
+
+_ARGUMENT_CACHE_MAX_LENGTH = 65536
+
+
+@lru_cache(maxsize=128)
+def _parse_arguments_cached(arguments: Any) -> tuple[Any, bool]:
+    parsed = _loads_json(arguments)
+    flat = isinstance(parsed, dict) and not any(
+        isinstance(value, (dict, list)) for value in parsed.values()
+    )
+    return parsed, flat
+
+
 def parse_arguments(arguments: Any, tool_name: str) -> Dict[str, Any]:
-    if isinstance(arguments, str):
+    if isinstance(arguments, dict):
+        return arguments
+    # json.loads accepts UTF-8 bytes directly, so raw payloads skip a decode.
+    if isinstance(arguments, (str, bytes, bytearray)):
+        if not arguments:
+            return {}
+        if isinstance(arguments, bytearray):
+            arguments = bytes(arguments)
         try:
-            parsed = json.loads(arguments) if arguments else {}
-        except json.JSONDecodeError as exc:
+            # Retried calls resend identical argument strings; small ones are
+            # parsed once. Handlers get their own copy of the cached object so
+            # nothing they change leaks into a later identical call.
+            if len(arguments) <= _ARGUMENT_CACHE_MAX_LENGTH:
+                cached, flat = _parse_arguments_cached(arguments)
+                parsed = dict(cached) if flat else copy.deepcopy(cached)
+            else:
+                parsed = _loads_json(arguments)
+        except ValueError as exc:
             raise ValueError(f"{tool_name}: invalid arguments JSON ({exc})")
+        if not isinstance(parsed, dict):
+            raise ValueError(f"{tool_name}: arguments must be a JSON object")
         return parsed
-    if isinstance(arguments, dict):
-        return arguments
+    if isinstance(arguments, memoryview):
+        return parse_arguments(arguments.tobytes(), tool_name)
     return {}
 
 
+_PLAIN, _MAPPING, _SEQUENCE, _MODEL_DUMP, _DICT_METHOD, _PROBE = range(6)
+# Per-type conversion kind, filled lazily so hasattr() runs once per class
+# instead of once per node. _PROBE is for classes without either method, where
+# an instance may still carry one (e.g. SimpleNamespace).
+_PLAIN_KINDS: Dict[type, int] = {
+    str: _PLAIN,
+    int: _PLAIN,
+    float: _PLAIN,
+    bool: _PLAIN,
+    type(None): _PLAIN,
+    dict: _MAPPING,
+    list: _SEQUENCE,
+    tuple: _SEQUENCE,
+    set: _SEQUENCE,
+}
+
+
+def _plain_kind(cls: type) -> int:
+    if issubclass(cls, (str, int, float, bool)):
+        kind = _PLAIN
+    elif issubclass(cls, dict):
+        kind = _MAPPING
+    elif issubclass(cls, (list, tuple, set)):
+        kind = _SEQUENCE
+    elif hasattr(cls, "model_dump"):
+        kind = _MODEL_DUMP
+    elif hasattr(cls, "dict"):
+        kind = _DICT_METHOD
+    else:
+        kind = _PROBE
+    _PLAIN_KINDS[cls] = kind
+    return kind
+
+
+def to_plain_data(obj: Any) -> Any:
+    # Iterative walk: SDK payloads can nest deeply, and one frame per node is
+    # both slow and a RecursionError risk. Each stack entry is (parent, key,
+    # value); the parent slot is pre-filled so dict/list order is preserved.
+    root: List[Any] = [None]
+    stack: List[tuple[Any, Any, Any]] = [(root, 0, obj)]
+    kinds = _PLAIN_KINDS
+    while stack:
+        parent, key, value = stack.pop()
+        while True:
+            cls = type(value)
+            kind = kinds.get(cls)
+            if kind is None:
+                kind = _plain_kind(cls)
+            if kind == _PLAIN:
+                parent[key] = value
+                break
+            if kind == _MAPPING:
+                out: Any = dict.fromkeys(value)
+                stack.extend((out, k, v) for k, v in value.items())
+                parent[key] = out
+                break
+            if kind == _SEQUENCE:
+                out = [None] * len(value)
+                stack.extend((out, i, v) for i, v in enumerate(value))
+                parent[key] = out
+                break
+            if kind == _MODEL_DUMP or (kind == _PROBE and hasattr(value, "model_dump")):
+                value = value.model_dump()
+                continue
+            if kind == _DICT_METHOD or (kind == _PROBE and hasattr(value, "dict")):
+                value = value.dict()
+                continue
+            try:
+                iterator = iter(value)
+            except TypeError:
+                parent[key] = str(value)
+                break
+            value = list(iterator)
+    return root[0]
+
+
+# Built once: json.dumps() with custom separators constructs an encoder per call.
+_encode_arguments = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+
+def make_user_message(text: str) -> Dict[str, Any]:
+    return {"role": "user", "content": [{"type": "input_text", "text": text}]}
+
+
+def make_assistant_message(text: str) -> Dict[str, Any]:
+    return {"role": "assistant", "content": [{"type": "output_text", "text": text}]}
+
+
+def make_tool_result_message(call_id: str, text: str) -> Dict[str, Any]:
+    return {"type": "function_call_output", "call_id": call_id, "output": text}
+
+
+def make_tool_call_item(
+    *,
+    call_id: str,
+    tool_name: str,
+    arguments: Any,
+    raw_id: Any = None,
+) -> Dict[str, Any]:
+    serialized_arguments = (
+        arguments if isinstance(arguments, str) else _encode_arguments(arguments or {})
+    )
+    item: Dict[str, Any] = {
+        "type": "function_call",
+        "call_id": call_id,
+        "name": tool_name,
+        "arguments": serialized_arguments,
+    }
+    if raw_id is not None:
+        item["id"] = str(raw_id)
+    return item
+
+
+def _relative_within(path: Path, root: Path) -> Optional[Path]:
+    # A string prefix test on the already-resolved paths instead of
+    # relative_to(), which splits both into parts and raises on a miss.
+    path_str = os.fspath(path)
+    root_str = os.fspath(root)
+    if path_str == root_str:
+        return Path(".")
+    prefix = root_str.rstrip(os.sep) + os.sep
+    if not path_str.startswith(prefix):
+        return None
+    return Path(path_str[len(prefix) :])
+
+
 def is_ignored_path(path: Path, root: Path) -> bool:
-    try:
-        relative = path.relative_to(root)
-    except ValueError:
+    relative = _relative_within(path, root)
+    if relative is None:
         relative = path
     return any(part in IGNORED_PATH_NAMES for part in relative.parts)
 
 
-def handle_tool_call(
-    tool_name: str,
-    arguments: Any,
-    runtime: ToolRuntime,
-) -> tuple[str, bool]:
-    args = parse_arguments(arguments, tool_name)
-    runtime.debug(f"tool_call name={tool_name} args_preview={str(args)[:200]}")
+def _read_file_arguments(args: Dict[str, Any]) -> tuple[Any, int, int]:
+    limit = max(int(args.get("limit", 8000) or 8000), 0)
+    offset = max(int(args.get("offset", 0) or 0), 0)
+    return args.get("path"), offset, limit
+
+
+def _write_arguments(args: Dict[str, Any]) -> tuple[Any, Any]:
+    contents = args.get("content")
+    if contents is None:
+        contents = args.get("contents")
+    return args.get("filePath") or args.get("path"), contents
 
-    if tool_name == "read_file":
-        path_arg = args.get("path")
-        if not path_arg:
-            return "error: missing path", False
-        path = Path(path_arg)
-        path = (
-            (runtime.default_root / path).resolve()
-            if not path.is_absolute()
-            else path.resolve()
-        )
-        try:
-            path.relative_to(runtime.base_root)
-        except ValueError:
-            return f"error: path outside project root ({path})", False
 
-        limit = int(args.get("limit", 8000) or 8000)
-        offset = int(args.get("offset", 0) or 0)
+def _trim_partial_utf8(raw: bytes) -> bytes:
+    # A byte window can end inside a multi-byte character; drop that tail
+    # (at most 3 bytes) instead of decoding it to U+FFFD.
+    for back in range(1, min(4, len(raw)) + 1):
+        byte = raw[-back]
+        if byte & 0xC0 == 0x80:
+            continue
+        if byte >= 0xC0:
+            needed = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            if back < needed:
+                return raw[:-back]
+        return raw
+    return raw
+
+
+def _tool_read_file(args: Dict[str, Any], runtime: ToolRuntime) -> tuple[str, bool]:
+    path_arg, offset, limit = _read_file_arguments(args)
+    if not path_arg:
+        return "error: missing path", False
+    path = resolve_tool_path(runtime.default_root, path_arg)
+    relative = _relative_within(path, runtime.base_root)
+    if relative is None:
+        return f"error: path outside project root ({path})", False
+
+    # offset/limit are byte counts per the schema: read just that window
+    # instead of decoding the whole file and slicing it.
+    try:
+        fd = os.open(path, os.O_RDONLY)
         try:
-            data = path.read_text(encoding="utf-8", errors="replace")
-        except Exception as exc:
-            return f"error: failed to read {path}: {exc}", False
+            raw = os.pread(fd, limit, offset)
+        finally:
+            os.close(fd)
+    except Exception as exc:
+        return f"error: failed to read {path}: {exc}", False
+    if len(raw) == limit:
+        raw = _trim_partial_utf8(raw)
 
-        snippet = data[offset : offset + limit]
-        preview = (
-            f"Contents of {path.relative_to(runtime.base_root)}\n```\n{snippet}\n```"
-        )
-        return preview, False
-
-    if tool_name in {"write", "write_file"}:
-        if not runtime.jfdi_enabled:
-            return JFDI_REQUIRED_MESSAGE, False
-        path_arg = args.get("filePath") or args.get("path")
-        contents = args.get("content")
-        if contents is None:
-            contents = args.get("contents")
-        if not path_arg or contents is None:
-            return "error: missing file path or contents", False
-        path = Path(path_arg)
-        path = (
-            (runtime.default_root / path).resolve()
-            if not path.is_absolute()
-            else path.resolve()
+    snippet = raw.decode("utf-8", errors="replace")
+    if "\r" in snippet:
+        snippet = snippet.replace("\r\n", "\n").replace("\r", "\n")
+    preview = f"Contents of {relative}\n```\n{snippet}\n```"
+    return preview, False
+
+
+def _tool_write(
+    tool_name: str, args: Dict[str, Any], runtime: ToolRuntime
+) -> tuple[str, bool]:
+    if not runtime.jfdi_enabled:
+        return JFDI_REQUIRED_MESSAGE, False
+    path_arg, contents = _write_arguments(args)
+    if not path_arg or contents is None:
+        return "error: missing file path or contents", False
+    path = resolve_tool_path(runtime.default_root, path_arg)
+    key = (str(path), contents)
+    if key in runtime.seen_writes:
+        runtime.debug(
+            f"tool_result name={tool_name} skipped duplicate write len={len(contents)}"
         )
-        key = (str(path), contents)
-        if key in runtime.seen_writes:
-            runtime.debug(
-                f"tool_result name={tool_name} skipped duplicate write len={len(contents)}"
-            )
-            return "no_change", False
-        auto_apply = instruction_implies_write(runtime.latest_instruction)
-        status = apply_file_update(
-            path_arg,
-            contents,
-            runtime,
-            auto_apply=auto_apply,
+        return "no_change", False
+    auto_apply = instruction_implies_write(runtime.latest_instruction)
+    status = apply_file_update(
+        path_arg,
+        contents,
+        runtime,
+        auto_apply=auto_apply,
+    )
+    mutated = status == "applied"
+    if status in {"applied", "no_change"}:
+        runtime.seen_writes.add(key)
+    runtime.debug(f"tool_result name={tool_name} mutated={mutated} len={len(contents)}")
+    return status, mutated
+
+
+def _tool_apply_patch(
+    args: Dict[str, Any], runtime: ToolRuntime
+) -> tuple[str, bool]:
+    if not runtime.jfdi_enabled:
+        return JFDI_REQUIRED_MESSAGE, False
+    patch_text = args.get("patch") or args.get("input")
+    if not patch_text:
+        return "error: missing patch", False
+    runtime.renderer.display_info("# apply_patch proposal\n" + patch_text)
+    if not runtime.renderer.prompt_confirm("Apply patch? [y/N]: ", default_no=True):
+        return "user_rejected", False
+    patched = _apply_unified_diff(patch_text, runtime.base_root)
+    if patched is not None:
+        runtime.renderer.display_info(
+            "\n".join(f"patching file {name}" for name in patched)
         )
-        mutated = status == "applied"
-        if status in {"applied", "no_change"}:
-            runtime.seen_writes.add(key)
-        runtime.debug(
-            f"tool_result name={tool_name} mutated={mutated} len={len(contents)}"
+        runtime.touched_paths.update(runtime.base_root / name for name in patched)
+        return "applied", True
+    # patch writes each file as it goes, so a failing hunk in a later file
+    # would leave earlier ones changed; rehearse first and only apply a patch
+    # that goes through cleanly.
+    command = ["patch", "-p0", "--batch", "--forward"]
+    try:
+        proc = subprocess.run(
+            [*command, "--dry-run"],
+            input=patch_text,
+            text=True,
+            cwd=runtime.base_root,
+            capture_output=True,
         )
-        return status, mutated
-
-    if tool_name == "apply_patch":
-        if not runtime.jfdi_enabled:
-            return JFDI_REQUIRED_MESSAGE, False
-        patch_text = args.get("patch") or args.get("input")
-        if not patch_text:
-            return "error: missing patch", False
-        runtime.renderer.display_info("# apply_patch proposal\n" + patch_text)
-        if not runtime.renderer.prompt_confirm("Apply patch? [y/N]: ", default_no=True):
-            return "user_rejected", False
-        try:
+        if proc.returncode == 0:
             proc = subprocess.run(
-                ["patch", "-p0", "--batch", "--forward"],
+                command,
                 input=patch_text,
                 text=True,
                 cwd=runtime.base_root,
                 capture_output=True,
             )
-        except FileNotFoundError:
-            return "error: 'patch' command not available", False
-        if proc.returncode != 0:
-            if proc.stdout:
-                runtime.renderer.display_info(proc.stdout)
-            if proc.stderr:
-                runtime.renderer.display_error(proc.stderr)
-            return f"error: patch failed (status {proc.returncode})", False
+    except FileNotFoundError:
+        return "error: 'patch' command not available", False
+    if proc.returncode != 0:
         if proc.stdout:
             runtime.renderer.display_info(proc.stdout)
-        return "applied", True
+        if proc.stderr:
+            runtime.renderer.display_error(proc.stderr)
+        return f"error: patch failed (status {proc.returncode})", False
+    if proc.stdout:
+        runtime.renderer.display_info(proc.stdout)
+    runtime.touched_paths.add(runtime.base_root)
+    return "applied", True
+
 
-    if tool_name == "shell":
-        if not runtime.jfdi_enabled:
-            return JFDI_REQUIRED_MESSAGE, False
-        return handle_shell_command(args, runtime)
+def _tool_shell(args: Dict[str, Any], runtime: ToolRuntime) -> tuple[str, bool]:
+    if not runtime.jfdi_enabled:
+        return JFDI_REQUIRED_MESSAGE, False
+    return handle_shell_command(args, runtime)
 
-    if tool_name == "update_plan":
-        plan = (args.get("plan") or "").strip()
-        explanation = (args.get("explanation") or "").strip() or None
-        runtime.plan_state["plan"] = plan
-        runtime.renderer.display_plan_update(plan, explanation)
-        response = "plan updated"
-        if explanation:
-            response += f"; notes: {explanation}"
-        runtime.debug("tool_result name=update_plan mutated=False")
-        return response, False
 
-    if tool_name == "unit_test_coverage":
-        return run_unit_test_coverage(args, runtime)
+def _tool_update_plan(
+    args: Dict[str, Any], runtime: ToolRuntime
+) -> tuple[str, bool]:
+    plan = (args.get("plan") or "").strip()
+    explanation = (args.get("explanation") or "").strip() or None
+    runtime.plan_state["plan"] = plan
+    runtime.renderer.display_plan_update(plan, explanation)
+    response = "plan updated"
+    if explanation:
+        response += f"; notes: {explanation}"
+    runtime.debug("tool_result name=update_plan mutated=False")
+    return response, False
 
-    if tool_name == "glob":
-        return run_glob_search(args, runtime)
 
-    if tool_name == "search_content":
-        return run_search_content(args, runtime)
+def handle_tool_call(
+    tool_name: str,
+    arguments: Any,
+    runtime: ToolRuntime,
+) -> tuple[str, bool]:
+    args = parse_arguments(arguments, tool_name)
+    runtime.debug(f"tool_call name={tool_name} args_preview={str(args)[:200]}")
+    handler = _TOOL_HANDLERS.get(tool_name)
+    if handler is None:
+        return f"error: unknown tool '{tool_name}'", False
+    return handler(args, runtime)
 
-    if tool_name == "plan_update":
-        return run_plan_update(args, runtime)
 
-    return f"error: unknown tool '{tool_name}'", False
+def read_utf8_text(path: Path) -> str:
+    # One read + decode in C instead of TextIOWrapper's chunked decoding; the
+    # newline translation read_text() did is applied only when needed.
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return ""
+    text = data.decode("utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
 
 
 def apply_file_update(
@@ -773,30 +1076,27 @@ def apply_file_update(
 ) -> str:
     if not runtime.jfdi_enabled:
         return JFDI_REQUIRED_MESSAGE
-    path = Path(filename)
-    path = (
-        (runtime.default_root / path).resolve()
-        if not path.is_absolute()
-        else path.resolve()
-    )
+    path = resolve_tool_path(runtime.default_root, filename)
 
-    try:
-        relative = path.relative_to(runtime.base_root)
-    except ValueError:
+    relative = _relative_within(path, runtime.base_root)
+    if relative is None:
         runtime.renderer.display_info(
             f"[skip] refusing to modify outside project root: {path}"
         )
         return "skipped_out_of_scope"
 
     try:
-        old_text = path.read_text(encoding="utf-8")
-    except FileNotFoundError:
-        old_text = ""
+        old_text = read_utf8_text(path)
     except Exception as exc:
         message = f"error: failed to read {relative}: {exc}"
         runtime.renderer.display_error(message)
         return message
 
+    # Identical text would only produce an empty diff in the reviewer.
+    if old_text == content:
+        runtime.debug(f"apply_file_update: unchanged {relative}")
+        return "no_change"
+
     status = runtime.renderer.review_file_update(
         target_path=path,
         display_path=relative,
@@ -806,38 +1106,205 @@ def apply_file_update(
     )
 
     if status == "delete_requested":
-        return delete_path_via_shell(path, runtime)
+        return delete_path(path, runtime)
 
+    if status == "applied":
+        runtime.touched_paths.add(path)
     return status
 
 
-def delete_path_via_shell(path: Path, runtime: ToolRuntime) -> str:
-    try:
-        relative = path.relative_to(runtime.base_root)
-    except ValueError:
+def _split_keepends(text: str) -> List[str]:
+    # Like splitlines(keepends=True) but only on "\n", so form feeds and other
+    # Unicode line breaks inside a line stay part of it.
+    parts = text.split("\n")
+    lines = [part + "\n" for part in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def _iter_matching_lines(
+    compiled: Any, text: str, jump: bool
+) -> Iterator[tuple[int, str]]:
+    # Lines are matched without their "\n", as rg does, so "$" and "\s" never
+    # see the terminator.
+    if not jump:
+        lines = text.split("\n")
+        if not lines[-1]:
+            lines.pop()
+        for line_number, line in enumerate(lines, start=1):
+            if compiled.search(line):
+                yield line_number, line
+        return
+    # A line that matches on its own also matches in place within the whole
+    # text, so the engine skips between hits and only their lines are checked.
+    pos = 0
+    line_number = 1
+    length = len(text)
+    while pos < length:
+        match = compiled.search(text, pos)
+        if match is None:
+            return
+        newline = text.rfind("\n", pos, match.start())
+        start = pos if newline == -1 else newline + 1
+        if start == length:
+            return  # an empty match after the final "\n" is not a line
+        line_number += text.count("\n", pos, start)
+        end = text.find("\n", start)
+        if end == -1:
+            end = length
+        line = text[start:end]
+        if compiled.search(line):
+            yield line_number, line
+        line_number += 1
+        pos = end + 1
+
+
+def _diff_name(header: str) -> str:
+    name = header.rstrip("\r\n").split("\t", 1)[0].strip()
+    if len(name) > 1 and name[0] == name[-1] == '"':
+        return ""
+    return name
+
+
+_Hunk = tuple[int, List[str], List[str]]
+
+
+def _parse_unified_diff(
+    patch_text: str,
+) -> Optional[List[tuple[str, str, List[_Hunk]]]]:
+    if not patch_text.endswith("\n"):
+        patch_text += "\n"
+    lines = _split_keepends(patch_text)
+    files: List[tuple[str, str, List[_Hunk]]] = []
+    index = 0
+    total = len(lines)
+    while index < total:
+        line = lines[index]
+        if not (
+            line.startswith("--- ")
+            and index + 1 < total
+            and lines[index + 1].startswith("+++ ")
+        ):
+            index += 1
+            continue
+        old_name = _diff_name(line[4:])
+        new_name = _diff_name(lines[index + 1][4:])
+        if not old_name or not new_name:
+            return None
+        index += 2
+        hunks: List[_Hunk] = []
+        while index < total and lines[index].startswith("@@"):
+            header = _HUNK_HEADER_RE.match(lines[index])
+            if header is None:
+                return None
+            old_start = int(header.group(1))
+            old_len = int(header.group(2) or 1)
+            new_len = int(header.group(4) or 1)
+            index += 1
+            old_lines: List[str] = []
+            new_lines: List[str] = []
+            while len(old_lines) < old_len or len(new_lines) < new_len:
+                if index >= total:
+                    return None
+                body = lines[index]
+                tag = body[:1]
+                if body == "\n":
+                    tag, body = " ", " \n"
+                if tag == " ":
+                    old_lines.append(body[1:])
+                    new_lines.append(body[1:])
+                elif tag == "-":
+                    old_lines.append(body[1:])
+                elif tag == "+":
+                    new_lines.append(body[1:])
+                else:
+                    return None
+                index += 1
+            if len(old_lines) != old_len or len(new_lines) != new_len:
+                return None
+            if index < total and lines[index].startswith("\\"):
+                return None
+            hunks.append((old_start, old_lines, new_lines))
+        if not hunks:
+            return None
+        files.append((old_name, new_name, hunks))
+    return files or None
+
+
+def _apply_unified_diff(patch_text: str, root: Path) -> Optional[List[str]]:
+    # In-process `patch -p0 --forward` for clean diffs: every hunk must match
+    # exactly where its header says. Anything else (fuzz, offsets, deletions,
+    # missing-newline markers, paths outside root) returns None so the caller
+    # falls back to the patch binary and its diagnostics.
+    parsed = _parse_unified_diff(patch_text)
+    if parsed is None:
+        return None
+    staged: List[tuple[Path, str, Optional[int]]] = []
+    names: List[str] = []
+    for old_name, new_name, hunks in parsed:
+        if new_name == "/dev/null":
+            return None
+        path = (root / new_name).resolve()
+        try:
+            path.relative_to(root)
+        except ValueError:
+            return None
+        mode: Optional[int] = None
+        if old_name == "/dev/null":
+            if path.exists():
+                return None
+            original: List[str] = []
+        else:
+            try:
+                mode = path.stat().st_mode
+                original = _split_keepends(path.read_bytes().decode("utf-8"))
+            except (OSError, UnicodeDecodeError):
+                return None
+        result: List[str] = []
+        cursor = 0
+        for old_start, old_lines, new_lines in hunks:
+            start = old_start - 1 if old_lines else old_start
+            if start < cursor or original[start : start + len(old_lines)] != old_lines:
+                return None
+            result.extend(original[cursor:start])
+            result.extend(new_lines)
+            cursor = start + len(old_lines)
+        result.extend(original[cursor:])
+        staged.append((path, "".join(result), mode))
+        names.append(new_name)
+    # Every file is checked before any is written, so a bad hunk in the last
+    # file leaves the tree untouched.
+    for path, text, mode in staged:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.patch-tmp")
+        temp_path.write_bytes(text.encode("utf-8"))
+        if mode is not None:
+            os.chmod(temp_path, stat.S_IMODE(mode))
+        os.replace(temp_path, path)
+    return names
+
+
+def delete_path(path: Path, runtime: ToolRuntime) -> str:
+    relative = _relative_within(path, runtime.base_root)
+    if relative is None:
         return "error: delete outside project root"
+    # Same rule the sandbox applies to command tokens: nothing touching .git.
+    if ".git" in relative.as_posix():
+        return "error: .git modifications are not permitted"
 
-    rm_cmd = f"rm {shlex.quote(str(relative))}"
+    # Like a plain "rm", directories are refused rather than removed recursively.
+    if path.is_dir() and not path.is_symlink():
+        return f"error: failed to delete {relative}: is a directory"
     try:
-        result = run_sandboxed_bash(
-            rm_cmd,
-            cwd=runtime.base_root,
-            scope_root=runtime.base_root,
-            timeout=30,
-            max_output_bytes=20000,
-        )
-    except CommandRejected as exc:
-        return f"error: {exc}"
-    except Exception as exc:
-        return f"error: failed to delete {relative}: {exc}"
-
-    formatted = format_command_result(result)
-    runtime.renderer.display_info(f"$ {rm_cmd}")
-    if formatted.strip():
-        runtime.renderer.display_shell_output(formatted)
+        os.unlink(path)
+    except FileNotFoundError:
+        return f"error: failed to delete {relative}: no such file"
+    except OSError as exc:
+        return f"error: failed to delete {relative}: {exc.strerror or exc}"
 
-    if result.exit_code != 0:
-        return f"error: rm exited with {result.exit_code}"
+    runtime.renderer.display_info(f"Deleted {relative}")
+    runtime.touched_paths.add(path)
     return "applied"
 
 
@@ -849,30 +1316,29 @@ def handle_shell_command(
     if isinstance(command, str):
         command_str = command
     elif isinstance(command, list):
-        command_str = " ".join(shlex.quote(str(part)) for part in command)
+        command_str = shlex.join(str(part) for part in command)
     else:
         return "error: invalid command; expected string or list", False
 
     workdir_arg = args.get("workdir")
-    workdir = Path(workdir_arg).expanduser() if workdir_arg else runtime.default_root
-    workdir = (
-        (runtime.default_root / workdir).resolve()
-        if not workdir.is_absolute()
-        else workdir.resolve()
+    default_str = str(runtime.default_root)
+    workdir_str = (
+        os.path.normpath(
+            os.path.join(default_str, os.path.expanduser(str(workdir_arg)))
+        )
+        if workdir_arg
+        else default_str
     )
-    try:
-        workdir.relative_to(runtime.base_root)
-    except ValueError:
-        return f"error: workdir outside project root ({workdir})", False
+    # run_sandboxed_bash resolves cwd and enforces the scope itself, so only
+    # pay for resolve() here when the lexical path is not already in scope
+    # (e.g. it goes through a symlink back into the project).
+    workdir = Path(workdir_str)
+    if _relative_within(workdir, runtime.base_root) is None:
+        workdir = workdir.resolve()
+        if _relative_within(workdir, runtime.base_root) is None:
+            return f"error: workdir outside project root ({workdir})", False
 
-    try:
-        timeout_seconds = max(1, int(os.environ.get("AI_BASH_MAX_SECONDS", "15")))
-    except (TypeError, ValueError):
-        timeout_seconds = 15
-    try:
-        max_output_bytes = max(1, int(os.environ.get("AI_BASH_MAX_OUTPUT", "20000")))
-    except (TypeError, ValueError):
-        max_output_bytes = 20000
+    timeout_seconds = _SHELL_MAX_SECONDS
 
     timeout_override = args.get("timeout_ms")
     if timeout_override is not None:
@@ -887,7 +1353,7 @@ def handle_shell_command(
             cwd=workdir,
             scope_root=runtime.base_root,
             timeout=timeout_seconds,
-            max_output_bytes=max_output_bytes,
+            max_output_bytes=_SHELL_MAX_OUTPUT,
         )
         formatted = format_command_result(result)
         rendered_parts = [f"$ {command_str}"]
@@ -897,6 +1363,8 @@ def handle_shell_command(
             rendered_parts.append("(no output)")
         rendered = "\n\n".join(rendered_parts)
         runtime.renderer.display_shell_output(rendered)
+        # Which files a command changed is unknown; the whole tree is stale.
+        runtime.touched_paths.add(runtime.base_root)
         return rendered, False
     except CommandRejected as exc:
         message = f"command rejected: {exc}"
@@ -904,6 +1372,9 @@ def handle_shell_command(
         return message, False
 
 
+_COVERAGE_COMMAND = shlex.join(["pytest", "--cov", "--cov-report=term-missing"])
+
+
 def run_unit_test_coverage(
     args: Dict[str, Any], runtime: ToolRuntime
 ) -> tuple[str, bool]:
@@ -920,7 +1391,7 @@ def run_unit_test_coverage(
         ):
             return "error: extraArgs must be a list of strings", False
 
-    command_parts = ["pytest", "--cov", "--cov-report=term-missing"]
+    command_parts: List[str] = []
     if target:
         cleaned_target = target.strip()
         if cleaned_target:
@@ -929,7 +1400,9 @@ def run_unit_test_coverage(
     if extra_args:
         command_parts.extend(extra_args)
 
-    command_str = " ".join(shlex.quote(part) for part in command_parts)
+    command_str = _COVERAGE_COMMAND
+    if command_parts:
+        command_str += " " + shlex.join(command_parts)
 
     timeout_ms = args.get("timeout_ms")
     timeout_seconds = 120
@@ -955,6 +1428,7 @@ def run_unit_test_coverage(
         message = f"error: failed to run pytest coverage: {exc}"
         runtime.renderer.display_error(message)
         return message, False
+    runtime.touched_paths.add(runtime.base_root)
 
     formatted = format_command_result(result)
     rendered_parts = [f"$ {command_str}"]
@@ -967,6 +1441,83 @@ def run_unit_test_coverage(
     return rendered, False
 
 
+@lru_cache(maxsize=1024)
+def _compile_glob(pattern: str) -> Callable[..., Any]:
+    return re.compile(fnmatch.translate(pattern)).match
+
+
+def _iter_glob(root: Path, pattern: str) -> Optional[Iterator[Path]]:
+    # Path.glob descends into .git and friends only for run_glob_search to drop
+    # every result there. Walk with os.scandir instead, pruning ignored names
+    # and never going deeper than the pattern can match. Shapes this does not
+    # cover (several or trailing "**", "." / "..", absolute) return None so the
+    # caller keeps Path.glob.
+    segments = pattern.split("/")
+    if (
+        pattern.startswith("/")
+        or any(segment in {"", ".", ".."} for segment in segments)
+        or segments.count("**") > 1
+        or segments[-1] == "**"
+    ):
+        return None
+    matchers = [
+        None if segment == "**" else _compile_glob(segment)
+        for segment in segments
+    ]
+    if None in matchers:
+        star = matchers.index(None)
+        head, tail = matchers[:star], matchers[star + 1 :]
+    else:
+        head, tail = matchers, None
+
+    def matches(parts: tuple[str, ...]) -> bool:
+        if tail is None:
+            return len(parts) == len(head) and head[-1](parts[-1]) is not None
+        if len(parts) < len(head) + len(tail):
+            return False
+        return all(
+            match(part) is not None
+            for match, part in zip(tail, parts[len(parts) - len(tail) :])
+        )
+
+    def walk(directory: str, parts: tuple[str, ...]) -> Iterator[Path]:
+        try:
+            with os.scandir(directory) as iterator:
+                entries = list(iterator)
+        except OSError:
+            return
+        depth = len(parts)
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            if name in IGNORED_PATH_NAMES:
+                continue
+            # Prefix segments must match on the way down; beyond them only a
+            # "**" keeps the walk going, and like Path.glob it does not follow
+            # symlinked directories there.
+            if depth < len(head):
+                if head[depth](name) is None:
+                    continue
+                follow = True
+            elif tail is None:
+                continue
+            else:
+                follow = False
+            child_parts = parts + (name,)
+            if matches(child_parts):
+                yield Path(entry.path)
+            descend = depth + 1 < len(head) or tail is not None
+            try:
+                if descend and entry.is_dir(follow_symlinks=follow):
+                    subdirs.append((entry.path, child_parts))
+            except OSError:
+                continue
+        for path, child_parts in subdirs:
+            yield from walk(path, child_parts)
+
+    return walk(os.fspath(root), ())
+
+
 def run_glob_search(args: Dict[str, Any], runtime: ToolRuntime) -> tuple[str, bool]:
     pattern = args.get("pattern")
     if not isinstance(pattern, str) or not pattern.strip():
@@ -990,47 +1541,121 @@ def run_glob_search(args: Dict[str, Any], runtime: ToolRuntime) -> tuple[str, bo
     if cwd_arg is not None:
         if not isinstance(cwd_arg, str) or not cwd_arg.strip():
             return "error: cwd must be a non-empty string", False
-        cwd_path = Path(cwd_arg).expanduser()
-        if not cwd_path.is_absolute():
-            cwd_path = (runtime.default_root / cwd_path).resolve()
-        else:
-            cwd_path = cwd_path.resolve()
-        try:
-            cwd_path.relative_to(runtime.base_root)
-        except ValueError:
-            return f"error: cwd outside project root ({cwd_path})", False
-        search_root = cwd_path
+        search_root = resolve_tool_path(
+            runtime.default_root, os.path.expanduser(cwd_arg)
+        )
+        if _relative_within(search_root, runtime.base_root) is None:
+            return f"error: cwd outside project root ({search_root})", False
     else:
         search_root = runtime.default_root
 
     if not search_root.exists():
         return f"error: cwd does not exist ({search_root})", False
 
-    matches: List[Path] = []
-    for candidate in search_root.glob(pattern_str):
-        candidate_path = candidate.resolve()
-        try:
-            candidate_path.relative_to(runtime.base_root)
-        except ValueError:
+    relative_matches: List[str] = []
+    candidates = _iter_glob(search_root, pattern_str)
+    if candidates is None:
+        candidates = search_root.glob(pattern_str)
+    for candidate in candidates:
+        relative = _relative_within(candidate.resolve(), runtime.base_root)
+        if relative is None:
             continue
-        if is_ignored_path(candidate_path, runtime.base_root):
+        if any(part in IGNORED_PATH_NAMES for part in relative.parts):
             continue
-        matches.append(candidate_path)
-        if len(matches) >= limit:
+        relative_matches.append(str(relative))
+        if len(relative_matches) >= limit:
             break
 
-    if not matches:
+    if not relative_matches:
         message = f"Glob pattern '{pattern_str}' returned no matches."
         runtime.renderer.display_info(message)
         return message, False
 
-    relative_matches = [str(path.relative_to(runtime.base_root)) for path in matches]
     header = f"Glob matches for '{pattern_str}' (showing {len(relative_matches)}):"
     rendered = "\n".join([header, *relative_matches]) + "\n"
     runtime.renderer.display_info(rendered)
     return rendered, False
 
 
+# Tool calls repeat the same patterns; compiled objects are cached here rather
+# than relying on re's own cache, which RE2 patterns never enter.
+@lru_cache(maxsize=256)
+def _compile_search_pattern(pattern: str, case_sensitive: bool) -> Any:
+    # Model-supplied patterns can backtrack catastrophically under ``re``;
+    # prefer RE2 when installed and keep ``re`` for what RE2 rejects
+    # (backreferences, lookaround). Multiline mode lets "^" and "$" match at
+    # line boundaries when whole file texts are searched.
+    if _re2 is not None:
+        try:
+            return _re2.compile(("(?m)" if case_sensitive else "(?mi)") + pattern)
+        except Exception:
+            pass
+    flags = re.MULTILINE
+    if not case_sensitive:
+        flags |= re.IGNORECASE
+    return re.compile(pattern, flags)
+
+
+def _iter_search_files(
+    directory: str, relative_prefix: str, prune: Callable[[str], bool]
+) -> Iterator[tuple[str, str]]:
+    # Same files and order as Path.rglob("*") filtered to regular files, but
+    # DirEntry answers is_file()/is_dir() from the directory listing, and
+    # ignored or excluded directories are never opened.
+    try:
+        with os.scandir(directory) as iterator:
+            entries = list(iterator)
+    except OSError:
+        return
+    subdirs = []
+    for entry in entries:
+        name = entry.name
+        if name in IGNORED_PATH_NAMES:
+            continue
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry)
+            elif entry.is_file():
+                yield entry.path, relative_prefix + name
+        except OSError:
+            continue
+    for entry in subdirs:
+        relative = relative_prefix + entry.name
+        if not prune(relative):
+            yield from _iter_search_files(entry.path, relative + "/", prune)
+
+
+@lru_cache(maxsize=256)
+def _glob_union(patterns: tuple[str, ...]) -> Optional[Callable[..., Any]]:
+    # One alternation of the translated globs matches a path in a single regex
+    # call instead of one fnmatch call per pattern.
+    if not patterns:
+        return None
+    union = "|".join(f"(?:{fnmatch.translate(pattern)})" for pattern in patterns)
+    return re.compile(union).match
+
+
+def _exclude_dir_matchers(exclude_patterns: List[str]) -> List[Callable[..., Any]]:
+    # "dir/*" and "dir/**" exclude everything below a directory matching
+    # "dir", so such directories can be skipped without listing them.
+    matchers = []
+    for pattern in exclude_patterns:
+        for suffix in ("/**", "/*"):
+            if pattern.endswith(suffix) and len(pattern) > len(suffix):
+                prefix = pattern[: -len(suffix)]
+                matchers.append(_compile_glob(prefix))
+                break
+    return matchers
+
+
+# Constructs whose meaning depends on where the subject string starts or ends;
+# with them a whole-text search can miss lines that match on their own.
+_LINE_ANCHORED_SYNTAX = (
+    "\\A", "\\Z", "\\z", "\\B", "(?<", "(?>", "(?!", "*+", "++", "?+", "}+"
+)
+_REGEX_METACHARACTERS = frozenset(".^$*+?{}[]\\|()\r\n")
+
+
 def run_search_content(args: Dict[str, Any], runtime: ToolRuntime) -> tuple[str, bool]:
     pattern_raw = args.get("pattern")
     if not isinstance(pattern_raw, str) or not pattern_raw.strip():
@@ -1086,14 +1711,10 @@ def run_search_content(args: Dict[str, Any], runtime: ToolRuntime) -> tuple[str,
     if cwd_arg is not None:
         if not isinstance(cwd_arg, str) or not cwd_arg.strip():
             return "error: cwd must be a non-empty string", False
-        cwd_path = Path(cwd_arg).expanduser()
-        if not cwd_path.is_absolute():
-            search_root = (runtime.default_root / cwd_path).resolve()
-        else:
-            search_root = cwd_path.resolve()
-        try:
-            search_root.relative_to(runtime.base_root)
-        except ValueError:
+        search_root = resolve_tool_path(
+            runtime.default_root, os.path.expanduser(cwd_arg)
+        )
+        if _relative_within(search_root, runtime.base_root) is None:
             return f"error: cwd outside project root ({search_root})", False
     else:
         search_root = runtime.default_root
@@ -1101,33 +1722,28 @@ def run_search_content(args: Dict[str, Any], runtime: ToolRuntime) -> tuple[str,
     if not search_root.exists():
         return f"error: cwd does not exist ({search_root})", False
 
-    matches: List[Dict[str, Any]] = []
+    # Matches are only ever rendered as "path:line: text", so each one is kept
+    # as its formatted line rather than a dict of fields.
+    matches: List[str] = []
     truncated = False
 
     rg_used = False
     command_result = None
     command_error: Optional[str] = None
 
-    command_parts: List[str] = [
-        "rg",
-        "--json",
-        "--line-number",
-        "--color",
-        "never",
-    ]
+    filter_parts: List[str] = []
     if not case_sensitive_flag:
-        command_parts.append("-i")
+        filter_parts.append("-i")
     for pattern_text in include_patterns:
-        command_parts.extend(["-g", pattern_text])
+        filter_parts.extend(["-g", pattern_text])
     for pattern_text in exclude_patterns:
-        command_parts.extend(["-g", f"!{pattern_text}"])
-    for pattern_text in DEFAULT_SEARCH_EXCLUDES:
-        command_parts.extend(["-g", f"!{pattern_text}"])
-    command_parts.extend(["-m", str(max_results)])
-    command_parts.append(pattern)
-    command_parts.append(".")
-
-    command_str = " ".join(shlex.quote(part) for part in command_parts)
+        filter_parts.extend(["-g", f"!{pattern_text}"])
+    command_pieces = [_RG_COMMAND]
+    if filter_parts:
+        command_pieces.append(shlex.join(filter_parts))
+    command_pieces.append(_RG_DEFAULT_EXCLUDES)
+    command_pieces.append(shlex.join(["-m", str(max_results), pattern, "."]))
+    command_str = " ".join(command_pieces)
 
     try:
         command_result = run_sandboxed_bash(
@@ -1147,11 +1763,14 @@ def run_search_content(args: Dict[str, Any], runtime: ToolRuntime) -> tuple[str,
     if command_result is not None:
         if command_result.exit_code in {0, 1}:  # 1 means no matches
             stdout = command_result.stdout.strip()
+            # rg reports every match with its file path; resolve each file
+            # once rather than once per matching line.
+            relative_paths: Dict[str, Optional[Path]] = {}
             if stdout:
                 for line in stdout.splitlines():
                     try:
-                        payload = json.loads(line)
-                    except json.JSONDecodeError:
+                        payload = _loads_json(line)
+                    except ValueError:
                         continue
                     if payload.get("type") != "match":
                         continue
@@ -1163,10 +1782,14 @@ def run_search_content(args: Dict[str, Any], runtime: ToolRuntime) -> tuple[str,
                     )
                     if not path_text:
                         continue
-                    path_obj = (search_root / path_text).resolve()
-                    try:
-                        relative = path_obj.relative_to(runtime.base_root)
-                    except ValueError:
+                    if path_text in relative_paths:
+                        relative = relative_paths[path_text]
+                    else:
+                        relative = _relative_within(
+                            (search_root / path_text).resolve(), runtime.base_root
+                        )
+                        relative_paths[path_text] = relative
+                    if relative is None:
                         continue
                     line_number = data.get("line_number")
                     if not isinstance(line_number, int):
@@ -1177,13 +1800,7 @@ def run_search_content(args: Dict[str, Any], runtime: ToolRuntime) -> tuple[str,
                         else ""
                     )
                     line_text = (line_text or "").rstrip("\n")
-                    matches.append(
-                        {
-                            "path": str(relative),
-                            "line": line_number,
-                            "text": line_text,
-                        }
-                    )
+                    matches.append(f"{relative}:{line_number}: {line_text}")
                     if len(matches) >= max_results:
                         truncated = True
                         break
@@ -1216,55 +1833,68 @@ def run_search_content(args: Dict[str, Any], runtime: ToolRuntime) -> tuple[str,
 
     if not matches:
         # fallback search in Python when rg failed or produced nothing with error
-        flags = re.MULTILINE
-        if not case_sensitive_flag:
-            flags |= re.IGNORECASE
         try:
-            compiled = re.compile(pattern, flags)
+            compiled = _compile_search_pattern(pattern, case_sensitive_flag)
         except re.error as exc:
             return f"error: invalid regex ({exc})", False
 
+        include_match = _glob_union(tuple(include_patterns))
+        exclude_match = _glob_union(tuple(exclude_patterns))
+
         def within_patterns(path_str: str) -> bool:
-            if include_patterns and not any(
-                fnmatch.fnmatch(path_str, pat) for pat in include_patterns
-            ):
+            if include_match is not None and not include_match(path_str):
                 return False
-            if exclude_patterns and any(
-                fnmatch.fnmatch(path_str, pat) for pat in exclude_patterns
-            ):
+            if exclude_match is not None and exclude_match(path_str):
                 return False
             return True
 
-        for file_path in search_root.rglob("*"):
-            if not file_path.is_file():
-                continue
-            if is_ignored_path(file_path, runtime.base_root):
+        # One read and decode per file; unless the pattern depends on where the
+        # subject starts or ends, whole-text searches jump between matching lines.
+        whole_text = not any(token in pattern for token in _LINE_ANCHORED_SYNTAX)
+        # A case-sensitive plain-text pattern can be looked for in the raw bytes,
+        # so files without it are never decoded.
+        literal = (
+            pattern.encode("utf-8")
+            if case_sensitive_flag and _REGEX_METACHARACTERS.isdisjoint(pattern)
+            else None
+        )
+        dir_excludes = _exclude_dir_matchers(exclude_patterns)
+
+        def prune(relative_dir: str) -> bool:
+            return any(match(relative_dir) for match in dir_excludes)
+
+        root_relative = _relative_within(search_root, runtime.base_root)
+        if root_relative is None or any(
+            part in IGNORED_PATH_NAMES for part in root_relative.parts
+        ):
+            files: Iterator[tuple[str, str]] = iter(())
+        else:
+            root_prefix = "" if root_relative == Path(".") else f"{root_relative}/"
+            files = _iter_search_files(os.fspath(search_root), root_prefix, prune)
+        for file_path, relative_str in files:
+            if not within_patterns(relative_str):
                 continue
             try:
-                relative = file_path.relative_to(runtime.base_root)
-            except ValueError:
+                with open(file_path, "rb") as handle:
+                    data = handle.read()
+            except OSError:
                 continue
-            relative_str = str(relative)
-            if not within_patterns(relative_str):
+            if b"\0" in data[:8192]:
+                continue  # binary file, skipped like rg does
+            if literal is not None and literal not in data:
                 continue
-            try:
-                with file_path.open("r", encoding="utf-8", errors="ignore") as handle:
-                    for line_number, line in enumerate(handle, start=1):
-                        if compiled.search(line):
-                            matches.append(
-                                {
-                                    "path": relative_str,
-                                    "line": line_number,
-                                    "text": line.rstrip("\n"),
-                                }
-                            )
-                            if len(matches) >= max_results:
-                                truncated = True
-                                break
+            text = data.decode("utf-8", errors="ignore")
+            if "\r" in text:
+                text = text.replace("\r\n", "\n").replace("\r", "\n")
+            for line_number, line_text in _iter_matching_lines(
+                compiled, text, whole_text
+            ):
+                matches.append(f"{relative_str}:{line_number}: {line_text}")
                 if len(matches) >= max_results:
+                    truncated = True
                     break
-            except OSError:
-                continue
+            if len(matches) >= max_results:
+                break
 
         if not matches:
             message = f"Search pattern '{pattern}' returned no matches."
@@ -1283,11 +1913,7 @@ def run_search_content(args: Dict[str, Any], runtime: ToolRuntime) -> tuple[str,
     if search_root != runtime.base_root:
         header += f" in {search_root.relative_to(runtime.base_root)}"
 
-    lines = [header]
-    for item in matches:
-        lines.append(f"{item['path']}:{item['line']}: {item['text']}")
-
-    rendered = "\n".join(lines) + "\n"
+    rendered = "\n".join([header, *matches]) + "\n"
     runtime.renderer.display_info(rendered)
     return rendered, False
 
@@ -1420,6 +2046,21 @@ def run_plan_update(args: Dict[str, Any], runtime: ToolRuntime) -> tuple[str, bo
     return response, False
 
 
+# One hash lookup per call instead of walking an if-chain of name compares.
+_TOOL_HANDLERS: Dict[str, Callable[[Dict[str, Any], ToolRuntime], tuple[str, bool]]] = {
+    "read_file": _tool_read_file,
+    "write": partial(_tool_write, "write"),
+    "write_file": partial(_tool_write, "write_file"),
+    "apply_patch": _tool_apply_patch,
+    "shell": _tool_shell,
+    "update_plan": _tool_update_plan,
+    "unit_test_coverage": run_unit_test_coverage,
+    "glob": run_glob_search,
+    "search_content": run_search_content,
+    "plan_update": run_plan_update,
+}
+
+
 __all__ = [
     "RendererProtocol",
     "TOOL_DEFINITIONS",
@@ -1429,7 +2070,7 @@ __all__ = [
     "ToolRuntime",
     "JFDI_REQUIRED_MESSAGE",
     "apply_file_update",
-    "delete_path_via_shell",
+    "delete_path",
     "detect_generated_files",
     "handle_shell_command",
     "handle_tool_call",
@@ -7,9 +7,10 @@ import os
 import shlex
 import subprocess
 import textwrap
+import threading
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable
+from typing import Dict, Iterable
 
 
 DISALLOWED_SUBSTRINGS: tuple[str, ...] = (
@@ -31,6 +32,11 @@ DISALLOWED_SUBSTRINGS: tuple[str, ...] = (
 )
 
 
+_ENV_MARKER = b"\0__ai_login_env__\0"
+_login_env_lock = threading.Lock()
+_login_env_cache: tuple[tuple[tuple[str, str], ...], Dict[str, str]] | None = None
+
+
 class CommandRejected(Exception):
     """Raised when a command violates sandboxing rules."""
 
@@ -73,6 +79,50 @@ def _validate_command(command: str) -> None:
         raise CommandRejected("Command rejected: .git modifications are not permitted")
 
 
+def _login_env_cached() -> bool:
+    return os.environ.get("AI_BASH_CACHE_LOGIN_ENV", "").strip().lower() in {
+        "1",
+        "true",
+        "yes",
+    }
+
+
+def _login_environment(base_env: Dict[str, str]) -> Dict[str, str]:
+    # Opt-in: `bash -l` re-sources the user's profile on every call, which can
+    # cost a second (conda, nvm, ...). Capture the exported environment a login
+    # shell ends up with once per parent environment and run `bash -c` instead.
+    # Profile functions and aliases are not carried over.
+    global _login_env_cache
+    key = tuple(sorted(base_env.items()))
+    with _login_env_lock:
+        cached = _login_env_cache
+        if cached is not None and cached[0] == key:
+            return dict(cached[1])
+        try:
+            completed = subprocess.run(
+                ["bash", "-lc", "printf '\\0__ai_login_env__\\0'; env -0"],
+                env=base_env,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                timeout=30,
+            )
+        except (OSError, subprocess.SubprocessError):
+            return dict(base_env)
+        _, found, payload = completed.stdout.partition(_ENV_MARKER)
+        if completed.returncode != 0 or not found:
+            return dict(base_env)
+        login_env: Dict[str, str] = {}
+        for entry in payload.split(b"\0"):
+            name, sep, value = entry.partition(b"=")
+            if sep and name:
+                login_env[os.fsdecode(name)] = os.fsdecode(value)
+        for transient in ("_", "SHLVL", "PWD", "OLDPWD"):
+            login_env.pop(transient, None)
+        _login_env_cache = (key, login_env)
+        return dict(login_env)
+
+
 def run_sandboxed_bash(
     command: str,
     cwd: Path,
@@ -97,10 +147,17 @@ def run_sandboxed_bash(
     env = os.environ.copy()
     env["LC_ALL"] = "C"
     env["LANG"] = "C"
+    shell_flag = "-lc"
+    if _login_env_cached():
+        env = _login_environment(env)
+        # The profile may have set its own locale; keep output parseable.
+        env["LC_ALL"] = "C"
+        env["LANG"] = "C"
+        shell_flag = "-c"
 
     try:
         completed = subprocess.run(
-            ["bash", "-lc", command],
+            ["bash", shell_flag, command],
             cwd=str(cwd),
             env=env,
             stdout=subprocess.PIPE,
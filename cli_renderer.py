@@ -23,6 +23,12 @@ except ImportError:  # pragma: no cover - readline absent on some platforms
     _readline = None
 
 
+_NON_ALPHA_RE = re.compile(r"[^a-z]")
+_DIFF_HUNK_RE = re.compile(
+    r"^@@ -(?P<old>\d+)(?:,(?P<old_count>\d+))? \+(?P<new>\d+)(?:,(?P<new_count>\d+))? @@"
+)
+
+
 class CLIRenderer:
     """Console renderer for the ai CLI."""
 
@@ -70,6 +76,7 @@ class CLIRenderer:
         self._hotkey_stop: Optional[threading.Event] = None
         self._hotkey_events: Deque[str] = deque()
         self._hotkey_lock = threading.Lock()
+        self.hotkey_pending = False
         self._hotkey_fd: Optional[int] = None
         self._hotkey_termios: Optional[Any] = None
 
@@ -86,6 +93,7 @@ class CLIRenderer:
             return
         with self._hotkey_lock:
             self._hotkey_events.append(name)
+            self.hotkey_pending = True
 
     def start_hotkey_listener(self) -> None:
         if self._hotkey_thread and self._hotkey_thread.is_alive():
@@ -105,6 +113,7 @@ class CLIRenderer:
         stop_event = threading.Event()
         with self._hotkey_lock:
             self._hotkey_events.clear()
+            self.hotkey_pending = False
         self._hotkey_stop = stop_event
         self._hotkey_fd = fd
         self._hotkey_termios = original_attrs
@@ -182,7 +191,10 @@ class CLIRenderer:
     def poll_hotkey_event(self) -> Optional[str]:
         with self._hotkey_lock:
             if self._hotkey_events:
-                return self._hotkey_events.popleft()
+                event = self._hotkey_events.popleft()
+                self.hotkey_pending = bool(self._hotkey_events)
+                return event
+            self.hotkey_pending = False
         return None
 
     def _is_summary_id(self, reasoning_id: str) -> bool:
@@ -247,7 +259,7 @@ class CLIRenderer:
         except EOFError:
             return False
 
-        response = re.sub(r"[^a-z]", "", response)
+        response = _NON_ALPHA_RE.sub("", response)
         positive = {
             "y",
             "yes",
@@ -443,15 +455,11 @@ class CLIRenderer:
         formatted: list[str] = []
         line_with_numbers = ""
         old_no = new_no = None
-        header_pattern = re.compile(
-            r"^@@ -(?P<old>\d+)(?:,(?P<old_count>\d+))? \+(?P<new>\d+)(?:,(?P<new_count>\d+))? @@"
-        )
-
         colorize = sys.stdout.isatty()
 
         for line in diff_lines:
             if line.startswith("@@"):
-                match = header_pattern.match(line)
+                match = _DIFF_HUNK_RE.match(line)
                 if match:
                     old_no = int(match.group("old"))
                     new_no = int(match.group("new"))
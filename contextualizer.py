@@ -3,14 +3,18 @@
 
 from __future__ import annotations
 
+import os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import Iterable, List
 
 DEFAULT_READ_LIMIT = 2000
 MAX_LINE_LENGTH = 2000
 MAX_READ_BYTES = 50 * 1024
 MAX_FILES = 8
+PARALLEL_READ_MIN_FILES = 4
+_READ_WORKERS = min(MAX_FILES, os.cpu_count() or 1)
 INTERESTING_PREFIXES = ("readme", "docs", "architecture", "overview")
 INTERESTING_SUFFIXES = (
     "README.md",
@@ -197,6 +201,27 @@ def _discover_candidates(scope_root: Path) -> List[Path]:
     return candidates
 
 
+def scope_fingerprint(scope_root: Path) -> tuple[tuple[str, bool, int, int], ...]:
+    """Cheap digest of the top-level entries ``collect_context`` looks at."""
+    entries: List[tuple[str, bool, int, int]] = []
+    try:
+        with os.scandir(scope_root) as scan:
+            for entry in scan:
+                try:
+                    if entry.is_dir():
+                        # Only the names of directories reach the context.
+                        entries.append((entry.name, True, 0, 0))
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry.name, False, stat.st_mtime_ns, stat.st_size))
+    except OSError:
+        return ()
+    entries.sort()
+    return tuple(entries)
+
+
 def collect_context(
     scope: Path,
     *,
@@ -215,20 +240,79 @@ def collect_context(
         except FileNotFoundError:
             listing.append("<scope directory missing>")
 
-    files: List[FileSlice] = []
+    requests: List[tuple[Path, int, int]] = []
     for candidate in _discover_candidates(scope_root):
-        if len(files) >= MAX_FILES:
+        if len(requests) >= MAX_FILES:
             break
         if candidate.is_dir():
             continue
         offset, limit = (0, default_limit)
         if file_windows and candidate in file_windows:
             offset, limit = file_windows[candidate]
-        max_bytes = max(1, min(limit_bytes, MAX_READ_BYTES))
-        window = read_file_slice(
-            candidate, offset=offset, limit=max(1, limit), max_bytes=max_bytes
+        requests.append((candidate, offset, max(1, limit)))
+
+    max_bytes = max(1, min(limit_bytes, MAX_READ_BYTES))
+
+    def _read(request: tuple[Path, int, int]) -> FileSlice:
+        path, offset, limit = request
+        return read_file_slice(path, offset=offset, limit=limit, max_bytes=max_bytes)
+
+    workers = min(len(requests), _READ_WORKERS)
+    if workers >= PARALLEL_READ_MIN_FILES:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            files = list(pool.map(_read, requests))
+    else:
+        files = [_read(request) for request in requests]
+
+    return CollectedContext(scope_root=scope_root, listing=listing, files=files)
+
+
+def refresh_paths(
+    collected: CollectedContext,
+    paths: Iterable[Path],
+    *,
+    limit_bytes: int = MAX_READ_BYTES,
+    default_limit: int = DEFAULT_READ_LIMIT,
+) -> CollectedContext:
+    """Re-collect ``collected`` re-reading only files at or below ``paths``."""
+    scope_root = collected.scope_root
+    # Candidates live under the resolved scope root; compare like with like.
+    changed = [Path(path).resolve() for path in paths]
+
+    def _is_changed(candidate: Path) -> bool:
+        return any(
+            candidate == path or path in candidate.parents for path in changed
+        )
+
+    listing: List[str] = []
+    if collected.listing:
+        try:
+            for entry in sorted(scope_root.iterdir()):
+                mark = "/" if entry.is_dir() else ""
+                listing.append(entry.name + mark)
+        except FileNotFoundError:
+            listing.append("<scope directory missing>")
+
+    previous = {file_slice.path: file_slice for file_slice in collected.files}
+    max_bytes = max(1, min(limit_bytes, MAX_READ_BYTES))
+    files: List[FileSlice] = []
+    for candidate in _discover_candidates(scope_root):
+        if len(files) >= MAX_FILES:
+            break
+        if candidate.is_dir():
+            continue
+        cached = previous.get(candidate)
+        if cached is not None and not _is_changed(candidate):
+            files.append(cached)
+            continue
+        offset, limit = (0, default_limit)
+        if cached is not None:
+            offset, limit = cached.offset, cached.limit
+        files.append(
+            read_file_slice(
+                candidate, offset=offset, limit=max(1, limit), max_bytes=max_bytes
+            )
         )
-        files.append(window)
 
     return CollectedContext(scope_root=scope_root, listing=listing, files=files)
 
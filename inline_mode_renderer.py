@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-import json
 import sys
+from collections import deque
 from pathlib import Path
-from typing import Any, Dict, List, Optional, TextIO
+from typing import Any, Deque, Dict, List, Optional, TextIO
 
 import openai
 
@@ -13,6 +13,11 @@ from ai_engine_tools import (
     ToolRuntime,
     handle_tool_call,
     instruction_implies_write,
+    to_plain_data,
+    make_assistant_message,
+    make_tool_call_item,
+    make_tool_result_message,
+    make_user_message,
 )
 from contextualizer import (
     DEFAULT_READ_LIMIT,
@@ -23,6 +28,8 @@ from contextualizer import (
     read_file_slice,
 )
 
+_REASONING_KEEP = ("type", "id", "summary", "content")
+
 
 class InlineModeRenderer:
     def __init__(
@@ -112,7 +119,7 @@ class InlineModeRenderer:
         )
 
         conversation_items: List[Dict[str, Any]] = [
-            self._make_user_message(user_message)
+            make_user_message(user_message)
         ]
 
         runtime = ToolRuntime(
@@ -139,7 +146,7 @@ class InlineModeRenderer:
             tool_calls = 0
             mutation_applied = False
             assistant_messages: List[str] = []
-            pending_reasoning_queue: List[Dict[str, Any]] = []
+            pending_reasoning_queue: Deque[Dict[str, Any]] = deque()
 
             for item in getattr(response, "output", []) or []:
                 item_type = getattr(item, "type", "")
@@ -148,7 +155,7 @@ class InlineModeRenderer:
                     text = self._extract_message_text(item)
                     if text:
                         assistant_messages.append(text)
-                        conversation_items.append(self._make_assistant_message(text))
+                        conversation_items.append(make_assistant_message(text))
                 elif item_type in {"tool_call", "function_call"}:
                     item_payload = self._convert_response_item(item)
                     tool_name = item_payload.get("name") or getattr(item, "name", "")
@@ -157,9 +164,9 @@ class InlineModeRenderer:
                     call_id = str(raw_call_id or f"tool-{tool_name}")
                     arguments_payload = item_payload.get("arguments", {})
                     if pending_reasoning_queue:
-                        conversation_items.append(pending_reasoning_queue.pop(0))
+                        conversation_items.append(pending_reasoning_queue.popleft())
                     conversation_items.append(
-                        self._make_tool_call_item(
+                        make_tool_call_item(
                             call_id=call_id,
                             tool_name=tool_name,
                             arguments=arguments_payload,
@@ -171,16 +178,15 @@ class InlineModeRenderer:
                     )
                     mutation_applied = mutation_applied or mutated
                     conversation_items.append(
-                        self._make_tool_result_message(call_id, result_text)
+                        make_tool_result_message(call_id, result_text)
                     )
                     tool_calls += 1
                 elif item_type == "reasoning":
                     reasoning_payload = self._convert_response_item(item)
                     sanitized = {
                         key: value
-                        for key, value in reasoning_payload.items()
-                        if key in {"type", "id", "summary", "content"}
-                        and value is not None
+                        for key in _REASONING_KEEP
+                        if (value := reasoning_payload.get(key)) is not None
                     }
                     sanitized.setdefault("type", "reasoning")
                     pending_reasoning_queue.append(sanitized)
@@ -238,7 +244,7 @@ class InlineModeRenderer:
                 response = None
                 stream_id = "inline:assistant:0"
                 stream_started = False
-                stream_buffer = ""
+                stream_parts: list[str] = []
                 with self.client.responses.stream(
                     model=model_id,
                     instructions=system_prompt,
@@ -255,10 +261,12 @@ class InlineModeRenderer:
                             if not stream_started:
                                 stream_started = True
                                 self.renderer.start_assistant_stream(stream_id)
-                            stream_buffer += delta
+                            stream_parts.append(delta)
                             self.renderer.update_assistant_stream(stream_id, delta)
                         elif event_type == "response.output_text.done":
-                            final_text = getattr(event, "text", "") or stream_buffer
+                            final_text = getattr(event, "text", "") or "".join(
+                                stream_parts
+                            )
                             if not stream_started:
                                 stream_started = True
                                 self.renderer.start_assistant_stream(stream_id)
@@ -272,6 +280,7 @@ class InlineModeRenderer:
                             stream, "final_response", None
                         )
                     if stream_started and not self._streamed_last_response:
+                        stream_buffer = "".join(stream_parts)
                         self.renderer.finish_assistant_stream(stream_id, stream_buffer)
                         self._streamed_last_response = bool(stream_buffer)
                 return response
@@ -359,62 +368,7 @@ class InlineModeRenderer:
         )
 
     def _to_plain_data(self, obj: Any) -> Any:
-        if isinstance(obj, (str, int, float, bool)) or obj is None:
-            return obj
-        if isinstance(obj, dict):
-            return {key: self._to_plain_data(value) for key, value in obj.items()}
-        if isinstance(obj, (list, tuple, set)):
-            return [self._to_plain_data(value) for value in obj]
-        if hasattr(obj, "model_dump"):
-            return self._to_plain_data(obj.model_dump())
-        if hasattr(obj, "dict"):
-            return self._to_plain_data(obj.dict())
-        try:
-            iterable = iter(obj)  # type: ignore[arg-type]
-        except TypeError:
-            return str(obj)
-        else:
-            return [self._to_plain_data(item) for item in iterable]
-
-    @staticmethod
-    def _make_user_message(text: str) -> Dict[str, Any]:
-        return {"role": "user", "content": [{"type": "input_text", "text": text}]}
-
-    @staticmethod
-    def _make_assistant_message(text: str) -> Dict[str, Any]:
-        return {
-            "role": "assistant",
-            "content": [{"type": "output_text", "text": text}],
-        }
-
-    @staticmethod
-    def _make_tool_result_message(call_id: str, text: str) -> Dict[str, Any]:
-        return {
-            "type": "function_call_output",
-            "call_id": call_id,
-            "output": text,
-        }
-
-    @staticmethod
-    def _make_tool_call_item(
-        *,
-        call_id: str,
-        tool_name: str,
-        arguments: Any,
-        raw_id: Any = None,
-    ) -> Dict[str, Any]:
-        serialized_arguments = (
-            arguments if isinstance(arguments, str) else json.dumps(arguments or {})
-        )
-        item: Dict[str, Any] = {
-            "type": "function_call",
-            "call_id": call_id,
-            "name": tool_name,
-            "arguments": serialized_arguments,
-        }
-        if raw_id is not None:
-            item["id"] = str(raw_id)
-        return item
+        return to_plain_data(obj)
 
     @staticmethod
     def _strip_leading_phrase(text: str, phrase: str) -> str:
@@ -151,6 +151,6 @@ class OrchestraScheduler:
             if not candidate.exists():
                 continue
             parts.extend(["--scope", str(candidate)])
-        inner = " ".join(shlex.quote(part) for part in parts)
+        inner = shlex.join(parts)
         shell = f"{inner} 2>&1 | tee -a {shlex.quote(str(log_path))}; exec bash"
         return f"bash -lc {shlex.quote(shell)}"
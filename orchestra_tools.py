@@ -3,7 +3,7 @@ from __future__ import annotations
 import json
 from dataclasses import asdict
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from orchestra_runtime import MUSICIAN_POOL, OrchestraRuntime
 from orchestra_scheduler import OrchestraScheduler
@@ -62,45 +62,17 @@ def handle_orchestra_tool_call(
         return json.dumps(parse_error), False
     assert args is not None
 
+    runtime_handler = _RUNTIME_HANDLERS.get(tool_name)
+    scheduler_handler = _SCHEDULER_HANDLERS.get(tool_name)
     try:
-        if tool_name == "compose_ensemble":
-            payload, mutated = run_compose_ensemble(args, runtime=runtime)
+        if runtime_handler is not None:
+            payload, mutated = runtime_handler(args, runtime=runtime)
             return json.dumps(payload), mutated
-        if tool_name == "set_musician_mandates":
-            payload, mutated = run_set_musician_mandates(args, runtime=runtime)
-            return json.dumps(payload), mutated
-        if tool_name == "dispatch_by_mandate":
-            payload, mutated = run_dispatch_by_mandate(
-                args, runtime=runtime, scheduler=scheduler
-            )
-            return json.dumps(payload), mutated
-        if tool_name == "poll_assignments":
-            payload, mutated = run_poll_assignments(
-                args, runtime=runtime, scheduler=scheduler
-            )
-            return json.dumps(payload), mutated
-        if tool_name == "wait_assignment":
-            payload, mutated = run_wait_assignment(
-                args, runtime=runtime, scheduler=scheduler
-            )
-            return json.dumps(payload), mutated
-        if tool_name == "collect_assignment_result":
-            payload, mutated = run_collect_assignment_result(args, runtime=runtime)
-            return json.dumps(payload), mutated
-        if tool_name == "cancel_assignment":
-            payload, mutated = run_cancel_assignment(
+        if scheduler_handler is not None:
+            payload, mutated = scheduler_handler(
                 args, runtime=runtime, scheduler=scheduler
             )
             return json.dumps(payload), mutated
-        if tool_name == "synthesize_ensemble":
-            payload, mutated = run_synthesize_ensemble(args, runtime=runtime)
-            return json.dumps(payload), mutated
-        if tool_name == "list_musicians":
-            payload, mutated = run_list_musicians(args, runtime=runtime)
-            return json.dumps(payload), mutated
-        if tool_name == "reset_task_ensemble":
-            payload, mutated = run_reset_task_ensemble(args, runtime=runtime)
-            return json.dumps(payload), mutated
     except ValueError as exc:
         return json.dumps(_err("invalid_args", str(exc))), False
     except Exception as exc:  # pragma: no cover - defensive
@@ -350,3 +322,20 @@ def run_reset_task_ensemble(
         raise ValueError(f"Unknown task_id: {task_id}")
     runtime.clear_mandates(task_id)
     return _ok({"task_id": task_id, "mandates_cleared": True}), True
+
+
+_RUNTIME_HANDLERS: Dict[str, Callable[..., tuple[Dict[str, Any], bool]]] = {
+    "compose_ensemble": run_compose_ensemble,
+    "set_musician_mandates": run_set_musician_mandates,
+    "collect_assignment_result": run_collect_assignment_result,
+    "synthesize_ensemble": run_synthesize_ensemble,
+    "list_musicians": run_list_musicians,
+    "reset_task_ensemble": run_reset_task_ensemble,
+}
+
+_SCHEDULER_HANDLERS: Dict[str, Callable[..., tuple[Dict[str, Any], bool]]] = {
+    "dispatch_by_mandate": run_dispatch_by_mandate,
+    "poll_assignments": run_poll_assignments,
+    "wait_assignment": run_wait_assignment,
+    "cancel_assignment": run_cancel_assignment,
+}
@@ -1,3 +1,4 @@
+import copy
 from collections import deque
 from types import SimpleNamespace
 from pathlib import Path
@@ -115,6 +116,9 @@ import pytest
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 import ai_engine
+import ai_engine_main
+from ai_engine_main import SUPERSEDED_SNAPSHOT_TEXT
+from ai_engine_tools import JFDI_REQUIRED_MESSAGE
 
 
 class DummyRenderer:
@@ -535,3 +539,456 @@ def test_tool_call_turn_continues_without_user_follow_up(monkeypatch):
     assert stream_count["count"] == 2
     assert renderer.follow_up_calls == 1
     assert renderer.assistant_messages == ["Done"]
+
+
+def test_resolve_scope_caches_until_path_disappears(monkeypatch, tmp_path):
+    monkeypatch.setattr(ai_engine.openai, "OpenAI", lambda **kwargs: object())
+    engine = ai_engine.AIEngine(
+        renderer=DummyRenderer(), config={"openai_api_key": "sk-1"}
+    )
+    repo_root = tmp_path.resolve()
+    (repo_root / "pkg").mkdir()
+
+    assert engine._resolve_scope("pkg", repo_root) == (repo_root / "pkg", "pkg")
+    assert ("pkg", repo_root) in engine._scope_cache
+    assert engine._resolve_scope("pkg", repo_root) == (repo_root / "pkg", "pkg")
+
+    (repo_root / "pkg").rmdir()
+    with pytest.raises(FileNotFoundError):
+        engine._resolve_scope("pkg", repo_root)
+    assert ("pkg", repo_root) not in engine._scope_cache
+
+
+def test_resolve_scope_rejects_sibling_with_shared_prefix(monkeypatch, tmp_path):
+    monkeypatch.setattr(ai_engine.openai, "OpenAI", lambda **kwargs: object())
+    engine = ai_engine.AIEngine(
+        renderer=DummyRenderer(), config={"openai_api_key": "sk-1"}
+    )
+    repo_root = (tmp_path / "repo").resolve()
+    repo_root.mkdir()
+    (tmp_path / "repo2").mkdir()
+
+    assert engine._resolve_scope(".", repo_root) == (repo_root, ".")
+    with pytest.raises(ValueError):
+        engine._resolve_scope("../repo2", repo_root)
+
+
+def _run_two_snapshot_refreshes(monkeypatch):
+    class WriteCallItem(SimpleNamespace):
+        def model_dump(self):
+            return {
+                "type": "function_call",
+                "id": self.id,
+                "call_id": self.call_id,
+                "name": "write",
+                "arguments": "{}",
+            }
+
+    responses = [
+        SimpleNamespace(
+            output=[
+                WriteCallItem(
+                    type="function_call", id=f"tool_{idx}", call_id=f"call_{idx}"
+                )
+            ]
+        )
+        for idx in range(2)
+    ]
+    responses.append(
+        SimpleNamespace(
+            output=[
+                SimpleNamespace(
+                    type="message",
+                    id="msg_done",
+                    content=[SimpleNamespace(type="output_text", text="Done")],
+                )
+            ]
+        )
+    )
+    request_inputs = []
+
+    class CapturingResponses:
+        def stream(self, **kwargs):
+            request_inputs.append(copy.deepcopy(kwargs.get("input")))
+            response = responses[len(request_inputs) - 1]
+            return DummyStream(
+                [SimpleNamespace(type="response.completed", response=response)],
+                response,
+            )
+
+    class CapturingClient:
+        def __init__(self):
+            self.responses = CapturingResponses()
+
+    monkeypatch.setattr(ai_engine.openai, "OpenAI", lambda **kwargs: CapturingClient())
+
+    engine = ai_engine.AIEngine(
+        renderer=DummyRenderer(), config={"openai_api_key": "sk-1"}
+    )
+    monkeypatch.setattr(
+        engine, "_handle_tool_call", lambda *args, **kwargs: ("applied", True)
+    )
+
+    assert engine.run_conversation("write twice", None) == 0
+    return request_inputs
+
+
+def _user_texts(items):
+    return [
+        item["content"][0]["text"]
+        for item in items
+        if isinstance(item, dict) and item.get("role") == "user"
+    ]
+
+
+def test_superseded_snapshots_are_collapsed(monkeypatch):
+    monkeypatch.setattr(ai_engine_main, "SNAPSHOT_COMPACT_BYTES", 0)
+
+    texts = _user_texts(_run_two_snapshot_refreshes(monkeypatch)[-1])
+
+    assert texts.count(SUPERSEDED_SNAPSHOT_TEXT) == 1
+    assert sum(text.startswith("Updated repository snapshot:\n") for text in texts) == 1
+
+
+def test_sent_history_is_untouched_below_the_compaction_threshold(monkeypatch):
+    request_inputs = _run_two_snapshot_refreshes(monkeypatch)
+
+    texts = _user_texts(request_inputs[-1])
+    assert SUPERSEDED_SNAPSHOT_TEXT not in texts
+    assert sum(text.startswith("Updated repository snapshot:\n") for text in texts) == 2
+    for earlier, later in zip(request_inputs, request_inputs[1:]):
+        assert later[: len(earlier)] == earlier
+
+
+def test_bare_dog_whistle_replays_gated_tool_calls(monkeypatch):
+    class WriteCallItem(SimpleNamespace):
+        def model_dump(self):
+            return {
+                "type": "function_call",
+                "id": "tool_1",
+                "call_id": "call_1",
+                "name": "write",
+                "arguments": '{"path": "a.txt", "content": "hi"}',
+            }
+
+    def message(text):
+        return SimpleNamespace(
+            output=[
+                SimpleNamespace(
+                    type="message",
+                    id=f"msg_{text}",
+                    content=[SimpleNamespace(type="output_text", text=text)],
+                )
+            ]
+        )
+
+    responses = [
+        SimpleNamespace(
+            output=[
+                WriteCallItem(
+                    type="function_call", id="tool_1", call_id="call_1", name="write"
+                )
+            ]
+        ),
+        message("Say jfdi to proceed"),
+        message("Done"),
+    ]
+    request_inputs = []
+
+    class CapturingResponses:
+        def stream(self, **kwargs):
+            request_inputs.append(list(kwargs.get("input")))
+            response = responses[len(request_inputs) - 1]
+            return DummyStream(
+                [SimpleNamespace(type="response.completed", response=response)],
+                response,
+            )
+
+    class CapturingClient:
+        def __init__(self):
+            self.responses = CapturingResponses()
+
+    monkeypatch.setattr(ai_engine.openai, "OpenAI", lambda **kwargs: CapturingClient())
+
+    renderer = DummyRenderer()
+    renderer.follow_ups.append("jfdi")
+    engine = ai_engine.AIEngine(renderer=renderer, config={"openai_api_key": "sk-1"})
+    executed = []
+
+    def fake_handle_tool_call(tool_name, arguments, **_kwargs):
+        if not engine.jfdi_enabled:
+            return JFDI_REQUIRED_MESSAGE, False
+        executed.append(tool_name)
+        return "applied", True
+
+    monkeypatch.setattr(engine, "_handle_tool_call", fake_handle_tool_call)
+
+    rc = engine.run_conversation("write a.txt", None)
+
+    assert rc == 0
+    assert executed == ["write"]
+    assert len(request_inputs) == 3
+    replayed = [
+        item
+        for item in request_inputs[2]
+        if isinstance(item, dict) and item.get("call_id") == "call_1-approved"
+    ]
+    assert [item["type"] for item in replayed] == [
+        "function_call",
+        "function_call_output",
+    ]
+    assert replayed[1]["output"] == "applied"
+
+
+def test_assistant_deltas_are_coalesced_within_window(monkeypatch):
+    final_response = SimpleNamespace(output=[])
+    events = [
+        SimpleNamespace(
+            type="response.output_text.delta",
+            delta=chunk,
+            item_id="msg_1",
+            content_index=0,
+            output_index=0,
+        )
+        for chunk in ("a", "b", "c")
+    ]
+    events.append(
+        SimpleNamespace(
+            type="response.output_text.done",
+            text="abc",
+            item_id="msg_1",
+            content_index=0,
+            output_index=0,
+        )
+    )
+
+    dummy_client = DummyClient(lambda: DummyStream(events, final_response))
+    monkeypatch.setattr(ai_engine.openai, "OpenAI", lambda **kwargs: dummy_client)
+    monkeypatch.setattr(ai_engine_main, "STREAM_COALESCE_NS", 10**12)
+
+    renderer = DummyRenderer()
+    engine = ai_engine.AIEngine(renderer=renderer, config={"openai_api_key": "sk-1"})
+
+    assert engine.run_conversation("What?", None) == 0
+    assert renderer.assistant_stream_chunks == ["a", "bc"]
+    assert renderer.assistant_stream_final == "abc"
+
+
+def test_function_call_arguments_done_carries_response(monkeypatch):
+    routed_response = SimpleNamespace(
+        output=[
+            SimpleNamespace(
+                type="message",
+                id="msg_1",
+                content=[SimpleNamespace(type="output_text", text="Routed")],
+            )
+        ]
+    )
+    events = [
+        SimpleNamespace(type="response.function_call_arguments.delta", delta="{"),
+        SimpleNamespace(
+            type="response.function_call_arguments.done", response=routed_response
+        ),
+        SimpleNamespace(type="response.unknown_event"),
+    ]
+
+    dummy_client = DummyClient(lambda: DummyStream(events, None))
+    monkeypatch.setattr(ai_engine.openai, "OpenAI", lambda **kwargs: dummy_client)
+
+    renderer = DummyRenderer()
+    engine = ai_engine.AIEngine(renderer=renderer, config={"openai_api_key": "sk-1"})
+
+    assert engine.run_conversation("What?", None) == 0
+    assert renderer.assistant_messages == ["Routed"]
+
+
+def test_run_edit_collects_streamed_responses_text(monkeypatch, tmp_path):
+    events = [
+        SimpleNamespace(type="response.output_text.delta", delta="new "),
+        SimpleNamespace(type="response.output_text.delta", delta="text"),
+    ]
+    dummy_client = DummyClient(lambda: DummyStream(events, None))
+    monkeypatch.setattr(ai_engine.openai, "OpenAI", lambda **kwargs: dummy_client)
+
+    reviewed = []
+
+    class ReviewRenderer(DummyRenderer):
+        def start_loader(self):
+            pass
+
+        def stop_loader(self):
+            pass
+
+        def review_file_update(self, *, new_text, **_kwargs):
+            reviewed.append(new_text)
+            return "applied"
+
+    monkeypatch.chdir(tmp_path)
+    target = tmp_path / "notes.txt"
+    target.write_text("old text")
+    engine = ai_engine.AIEngine(
+        renderer=ReviewRenderer(), config={"openai_api_key": "sk-1"}
+    )
+    engine.jfdi_enabled = True
+
+    assert engine.run_edit(str(target), "rewrite") == 0
+    assert reviewed == ["new text"]
+
+
+def test_coalesce_responses_text_reads_output_parts_without_dumping(monkeypatch):
+    monkeypatch.setattr(
+        ai_engine.openai, "OpenAI", lambda **kwargs: DummyClient(lambda: None)
+    )
+    engine = ai_engine.AIEngine(
+        renderer=DummyRenderer(), config={"openai_api_key": "sk-1"}
+    )
+
+    def _no_dump():
+        raise AssertionError("model_dump should not be needed")
+
+    response = SimpleNamespace(
+        output_text="",
+        model_dump=_no_dump,
+        output=[
+            SimpleNamespace(type="reasoning", content=None),
+            SimpleNamespace(
+                type="message",
+                content=[
+                    SimpleNamespace(type="output_text", text="hello "),
+                    SimpleNamespace(type="output_text", text="world"),
+                ],
+            ),
+        ],
+    )
+
+    assert engine._coalesce_responses_text(response) == "hello world"
+
+
+def test_run_edit_skips_review_for_identical_content(monkeypatch, tmp_path):
+    events = [
+        SimpleNamespace(type="response.output_text.delta", delta="same\r\ntext\n"),
+    ]
+    dummy_client = DummyClient(lambda: DummyStream(events, None))
+    monkeypatch.setattr(ai_engine.openai, "OpenAI", lambda **kwargs: dummy_client)
+
+    class ReviewRenderer(DummyRenderer):
+        def start_loader(self):
+            pass
+
+        def stop_loader(self):
+            pass
+
+        def review_file_update(self, **_kwargs):
+            raise AssertionError("identical content should not be reviewed")
+
+    monkeypatch.chdir(tmp_path)
+    target = tmp_path / "notes.txt"
+    target.write_bytes(b"same\r\ntext")
+    engine = ai_engine.AIEngine(
+        renderer=ReviewRenderer(), config={"openai_api_key": "sk-1"}
+    )
+    engine.jfdi_enabled = True
+
+    assert engine.run_edit(str(target), "rewrite") == 0
+
+
+def test_shell_burst_is_sent_as_one_user_message(monkeypatch):
+    final_response = SimpleNamespace(
+        output=[
+            SimpleNamespace(
+                type="message",
+                id="msg_1",
+                content=[SimpleNamespace(type="output_text", text="ok")],
+            )
+        ]
+    )
+    captured_inputs = []
+
+    class CapturingResponses:
+        def stream(self, **kwargs):
+            captured_inputs.append(list(kwargs.get("input")))
+            return DummyStream(
+                [SimpleNamespace(type="response.completed", response=final_response)],
+                final_response,
+            )
+
+    class CapturingClient:
+        def __init__(self):
+            self.responses = CapturingResponses()
+
+    monkeypatch.setattr(ai_engine.openai, "OpenAI", lambda **kwargs: CapturingClient())
+    monkeypatch.setattr(
+        ai_engine_main, "run_sandboxed_bash", lambda command, **_kwargs: command
+    )
+    monkeypatch.setattr(
+        ai_engine_main, "format_command_result", lambda result: f"ran {result}"
+    )
+
+    renderer = DummyRenderer()
+    renderer.follow_ups.extend(["!echo a", "!echo b", "next"])
+    engine = ai_engine.AIEngine(renderer=renderer, config={"openai_api_key": "sk-1"})
+
+    assert engine.run_conversation("start", None) == 0
+
+    shell_items = [
+        item
+        for item in captured_inputs[1]
+        if item.get("role") == "user"
+        and item["content"][0]["text"].startswith("Executed shell command")
+    ]
+    assert len(shell_items) == 1
+    text = shell_items[0]["content"][0]["text"]
+    assert "ran echo a" in text and "ran echo b" in text
+
+
+def test_tool_runtime_is_reused_per_root_pair(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        ai_engine.openai, "OpenAI", lambda **kwargs: DummyClient(lambda: None)
+    )
+    engine = ai_engine.AIEngine(
+        renderer=DummyRenderer(), config={"openai_api_key": "sk-1"}
+    )
+    first = engine._build_tool_runtime(
+        base_root=tmp_path, default_root=tmp_path, plan_state={}, latest_instruction=""
+    )
+    engine.jfdi_enabled = True
+    plan_state = {"plan": "x"}
+    second = engine._build_tool_runtime(
+        base_root=tmp_path,
+        default_root=tmp_path,
+        plan_state=plan_state,
+        latest_instruction="do it",
+    )
+
+    assert second is first
+    assert second.plan_state is plan_state
+    assert second.latest_instruction == "do it"
+    assert second.jfdi_enabled is True
+
+    other = engine._build_tool_runtime(
+        base_root=tmp_path,
+        default_root=tmp_path / "sub",
+        plan_state={},
+        latest_instruction="",
+    )
+    assert other is not first
+    assert other.seen_writes is first.seen_writes
+
+
+def test_http2_opt_in_keeps_default_transport_without_h2(monkeypatch):
+    captured = {}
+
+    def _client(**kwargs):
+        captured.update(kwargs)
+        return DummyClient(lambda: None)
+
+    monkeypatch.setattr(ai_engine.openai, "OpenAI", _client)
+    monkeypatch.setitem(sys.modules, "h2", None)
+    monkeypatch.setenv("AI_HTTP2", "1")
+    renderer = DummyRenderer()
+    engine = ai_engine.AIEngine(renderer=renderer, config={"openai_api_key": "sk-1"})
+
+    assert engine._settings.http2 is True
+    assert len(renderer.infos) == 1
+    assert "HTTP/2 was requested" in renderer.infos[0]
+    assert captured == {"api_key": "sk-1"}
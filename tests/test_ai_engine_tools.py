@@ -4,6 +4,7 @@ import json
 from pathlib import Path
 from types import SimpleNamespace
 
+import pytest
 
 import ai_engine_tools
 from bash_executor import CommandResult
@@ -453,3 +454,691 @@ def test_shell_blocked_without_jfdi():
 
     assert mutated is False
     assert message == ai_engine_tools.JFDI_REQUIRED_MESSAGE
+
+
+def test_detect_generated_files_extracts_fenced_block():
+    message = (
+        "I'll **save** this to `hello.py`:\n"
+        "```python\n"
+        "print('hi')\n"
+        "```\n"
+        "Then write the notes to notes.md\n"
+        "```\n"
+        "# Notes\n"
+        "\n"
+        "```\n"
+    )
+
+    assert ai_engine_tools.detect_generated_files(message) == [
+        ("hello.py", "print('hi')"),
+        ("notes.md", "# Notes"),
+    ]
+
+
+def test_detect_generated_files_requires_closing_fence():
+    assert ai_engine_tools.detect_generated_files("save it to a.py\n```\nx = 1") == []
+    assert ai_engine_tools.detect_generated_files("save it to a.py") == []
+
+
+def test_detect_generated_files_scans_large_replies_in_one_pass():
+    body = "value = 1\n" * 2000
+    blocks = [
+        f"Save this as mod{index}.py\n```python\n{body}```\n" for index in range(50)
+    ]
+    message = "Intro text.\n" * 1000 + "".join(blocks)
+
+    results = ai_engine_tools.detect_generated_files(message)
+
+    assert [name for name, _ in results] == [f"mod{index}.py" for index in range(50)]
+    assert all(contents == body.rstrip() for _, contents in results)
+
+
+def test_detect_generated_files_ignores_inline_fences():
+    message = "save it to a.py ```inline```\n```\nx = '```'\n```\n"
+    assert ai_engine_tools.detect_generated_files(message) == [("a.py", "x = '```'")]
+
+
+def test_to_plain_data_flattens_models_and_deep_nesting():
+    model = SimpleNamespace(model_dump=lambda: {"type": "message", "ids": (1, 2)})
+    assert ai_engine_tools.to_plain_data({"item": model, "tags": ["a", None]}) == {
+        "item": {"type": "message", "ids": [1, 2]},
+        "tags": ["a", None],
+    }
+
+    nested: list = []
+    cursor = nested
+    for _ in range(5000):
+        cursor.append([])
+        cursor = cursor[0]
+    result = ai_engine_tools.to_plain_data(nested)
+    depth = 0
+    while result:
+        result = result[0]
+        depth += 1
+    assert depth == 5000
+
+
+def test_make_tool_call_item_serializes_compactly():
+    item = ai_engine_tools.make_tool_call_item(
+        call_id="call-1", tool_name="write", arguments={"path": "é.txt", "n": 1}
+    )
+    assert item["arguments"] == '{"path":"é.txt","n":1}'
+    raw = ai_engine_tools.make_tool_call_item(
+        call_id="call-2", tool_name="write", arguments='{"a": 1}', raw_id=7
+    )
+    assert raw["arguments"] == '{"a": 1}'
+    assert raw["id"] == "7"
+
+
+def test_intent_and_filename_scans_stay_linear_on_adversarial_text():
+    hostile = "save write create " * 20000 + "\n```\n" + "to " * 20000
+    assert ai_engine_tools.detect_generated_files(hostile + "\n```\n") == []
+    assert ai_engine_tools.instruction_implies_write("add " * 50000) is False
+
+
+def test_read_file_reads_only_the_requested_byte_window(tmp_path: Path):
+    (tmp_path / "data.txt").write_bytes(b"0123456789\r\nabcdef")
+    runtime = make_runtime(DummyRenderer(), root=tmp_path)
+
+    output, mutated = ai_engine_tools.handle_tool_call(
+        "read_file", {"path": "data.txt", "offset": 8, "limit": 6}, runtime
+    )
+
+    assert mutated is False
+    assert output == "Contents of data.txt\n```\n89\nab\n```"
+
+
+def test_read_file_window_does_not_split_multibyte_characters(tmp_path: Path):
+    (tmp_path / "data.txt").write_text("aé€😀z", encoding="utf-8")
+    runtime = make_runtime(DummyRenderer(), root=tmp_path)
+
+    snippets = []
+    for limit in range(1, 12):
+        output, _ = ai_engine_tools.handle_tool_call(
+            "read_file", {"path": "data.txt", "limit": limit}, runtime
+        )
+        prefix, suffix = "Contents of data.txt\n```\n", "\n```"
+        assert output.startswith(prefix) and output.endswith(suffix)
+        snippets.append(output[len(prefix) : -len(suffix)])
+
+    assert "\ufffd" not in "".join(snippets)
+    assert snippets[:4] == ["a", "a", "aé", "aé"]
+    assert snippets[-2:] == ["aé€😀", "aé€😀z"]
+
+
+def test_path_checks_follow_symlinks_retargeted_elsewhere(tmp_path: Path):
+    root = tmp_path / "repo"
+    root.mkdir()
+    (root / "inside.txt").write_text("inside")
+    outside = tmp_path / "outside.txt"
+    outside.write_text("outside")
+    link = root / "link.txt"
+    link.symlink_to(root / "inside.txt")
+    runtime = make_runtime(DummyRenderer(), root=root)
+
+    output, _ = ai_engine_tools.handle_tool_call(
+        "read_file", {"path": "link.txt"}, runtime
+    )
+    assert "inside" in output
+
+    # Another process (editor, git checkout, a musician) retargets the link.
+    link.unlink()
+    link.symlink_to(outside)
+
+    output, _ = ai_engine_tools.handle_tool_call(
+        "read_file", {"path": "link.txt"}, runtime
+    )
+    assert output.startswith("error: path outside project root")
+
+
+class ApprovingRenderer(DummyRenderer):
+    def prompt_confirm(self, prompt: str, *, default_no: bool = True) -> bool:
+        return True
+
+
+def test_apply_patch_applies_clean_diff_in_process(monkeypatch, tmp_path: Path):
+    (tmp_path / "app.py").write_text("a = 1\nb = 2\nc = 3\n")
+    patch = (
+        "--- app.py\n"
+        "+++ app.py\n"
+        "@@ -1,3 +1,3 @@\n"
+        " a = 1\n"
+        "-b = 2\n"
+        "+b = 20\n"
+        " c = 3\n"
+        "--- /dev/null\n"
+        "+++ pkg/new.py\n"
+        "@@ -0,0 +1 @@\n"
+        "+x = 1\n"
+    )
+
+    def _no_subprocess(*_args, **_kwargs):
+        raise AssertionError("clean diffs should not spawn patch")
+
+    monkeypatch.setattr(ai_engine_tools.subprocess, "run", _no_subprocess)
+    runtime = make_runtime(ApprovingRenderer(), root=tmp_path)
+    runtime.jfdi_enabled = True
+
+    status, mutated = ai_engine_tools.handle_tool_call(
+        "apply_patch", {"patch": patch}, runtime
+    )
+
+    assert (status, mutated) == ("applied", True)
+    assert (tmp_path / "app.py").read_text() == "a = 1\nb = 20\nc = 3\n"
+    assert (tmp_path / "pkg" / "new.py").read_text() == "x = 1\n"
+
+
+def test_apply_patch_falls_back_to_binary_on_mismatch(monkeypatch, tmp_path: Path):
+    (tmp_path / "app.py").write_text("a = 1\n")
+    patch = "--- app.py\n+++ app.py\n@@ -1 +1 @@\n-a = 2\n+a = 3\n"
+    calls = []
+
+    def fake_run(args, **kwargs):
+        calls.append((args, kwargs["input"]))
+        return SimpleNamespace(returncode=1, stdout="", stderr="hunk FAILED")
+
+    monkeypatch.setattr(ai_engine_tools.subprocess, "run", fake_run)
+    runtime = make_runtime(ApprovingRenderer(), root=tmp_path)
+    runtime.jfdi_enabled = True
+
+    status, mutated = ai_engine_tools.handle_tool_call(
+        "apply_patch", {"patch": patch}, runtime
+    )
+
+    assert (status, mutated) == ("error: patch failed (status 1)", False)
+    assert calls == [(["patch", "-p0", "--batch", "--forward", "--dry-run"], patch)]
+    assert (tmp_path / "app.py").read_text() == "a = 1\n"
+
+
+def test_apply_patch_leaves_tree_untouched_when_a_later_file_fails(tmp_path: Path):
+    (tmp_path / "a.py").write_text("a = 1\n")
+    (tmp_path / "b.py").write_text("b = 1\n")
+    patch = (
+        "--- a.py\n+++ a.py\n@@ -1 +1 @@\n-a = 1\n+a = 2\n"
+        "--- b.py\n+++ b.py\n@@ -1 +1 @@\n-b = 9\n+b = 2\n"
+    )
+    runtime = make_runtime(ApprovingRenderer(), root=tmp_path)
+    runtime.jfdi_enabled = True
+
+    status, mutated = ai_engine_tools.handle_tool_call(
+        "apply_patch", {"patch": patch}, runtime
+    )
+
+    assert status.startswith("error: patch failed")
+    assert mutated is False
+    assert (tmp_path / "a.py").read_text() == "a = 1\n"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.py", "b.py"]
+
+
+def test_parse_arguments_accepts_raw_bytes():
+    assert ai_engine_tools.parse_arguments(b'{"path": "a.py"}', "read_file") == {
+        "path": "a.py"
+    }
+    assert ai_engine_tools.parse_arguments(b"", "read_file") == {}
+    with pytest.raises(ValueError):
+        ai_engine_tools.parse_arguments(b"\xff", "read_file")
+
+
+def test_parse_arguments_reuses_parses_but_returns_fresh_dicts():
+    blob = '{"filePath": "cached.txt", "content": "x"}'
+    first = ai_engine_tools.parse_arguments(blob, "write")
+    first["content"] = "changed"
+    second = ai_engine_tools.parse_arguments(blob, "write")
+
+    assert second == {"filePath": "cached.txt", "content": "x"}
+    assert second is not first
+    assert ai_engine_tools._parse_arguments_cached.cache_info().hits >= 1
+    assert ai_engine_tools.parse_arguments(bytearray(b'{"a": 1}'), "x") == {"a": 1}
+
+    nested = '{"todos": [{"id": "1", "status": "pending"}]}'
+    first = ai_engine_tools.parse_arguments(nested, "plan_update")
+    first["todos"][0]["status"] = "completed"
+    first["todos"].append({"id": "2"})
+    second = ai_engine_tools.parse_arguments(nested, "plan_update")
+    assert second == {"todos": [{"id": "1", "status": "pending"}]}
+
+    with pytest.raises(ValueError, match="must be a JSON object"):
+        ai_engine_tools.parse_arguments('["a.py"]', "read_file")
+
+
+def test_shell_workdir_stays_lexical_inside_scope(monkeypatch, tmp_path: Path):
+    root = tmp_path / "repo"
+    (root / "pkg").mkdir(parents=True)
+    (root / "alias").symlink_to(root / "pkg")
+    runtime = make_runtime(DummyRenderer(), root=root)
+    runtime.jfdi_enabled = True
+    seen: list[Path] = []
+
+    def fake_run(_command, *, cwd, **_kwargs):
+        seen.append(cwd)
+        return SimpleNamespace(exit_code=0)
+
+    monkeypatch.setattr(ai_engine_tools, "run_sandboxed_bash", fake_run)
+    monkeypatch.setattr(ai_engine_tools, "format_command_result", lambda _res: "")
+    for workdir in ("pkg/../pkg", str(root / "alias"), ""):
+        ai_engine_tools.handle_tool_call(
+            "shell", {"command": "pwd", "workdir": workdir}, runtime
+        )
+    assert seen == [root / "pkg", root / "alias", root]
+
+    output, _ = ai_engine_tools.handle_tool_call(
+        "shell", {"command": "pwd", "workdir": "../.."}, runtime
+    )
+    assert output.startswith("error: workdir outside project root")
+    assert len(seen) == 3
+
+
+def test_apply_file_update_reads_existing_text_with_universal_newlines(
+    tmp_path: Path,
+):
+    (tmp_path / "crlf.txt").write_bytes("café\r\nline\r".encode("utf-8"))
+    seen: dict[str, str] = {}
+
+    class ReviewingRenderer(DummyRenderer):
+        def review_file_update(self, *, old_text, **_kwargs):  # type: ignore[override]
+            seen["old"] = old_text
+            return "no_change"
+
+    runtime = make_runtime(ReviewingRenderer(), root=tmp_path)
+    runtime.jfdi_enabled = True
+    for name in ("crlf.txt", "missing.txt"):
+        status = ai_engine_tools.apply_file_update(
+            name, "new", runtime, auto_apply=True
+        )
+        assert status == "no_change"
+        assert seen.pop("old") == ("café\nline\n" if name == "crlf.txt" else "")
+
+
+def test_apply_file_update_skips_review_for_identical_content(tmp_path: Path):
+    (tmp_path / "same.txt").write_text("same\n")
+
+    class FailingRenderer(DummyRenderer):
+        def review_file_update(self, *args, **kwargs):  # type: ignore[override]
+            raise AssertionError("identical content should not be reviewed")
+
+    runtime = make_runtime(FailingRenderer(), root=tmp_path)
+    runtime.jfdi_enabled = True
+    status = ai_engine_tools.apply_file_update(
+        "same.txt", "same\n", runtime, auto_apply=True
+    )
+    assert status == "no_change"
+    assert runtime.touched_paths == set()
+
+
+def test_handle_tool_call_reports_unknown_tool():
+    runtime = make_runtime(DummyRenderer())
+    assert ai_engine_tools.handle_tool_call("teleport", "{}", runtime) == (
+        "error: unknown tool 'teleport'",
+        False,
+    )
+
+
+def test_scope_checks_reject_sibling_directories_sharing_a_prefix(tmp_path: Path):
+    root = tmp_path / "repo"
+    root.mkdir()
+    sibling = tmp_path / "repo-other"
+    sibling.mkdir()
+    (sibling / "secret.txt").write_text("secret")
+    (root / "ok.txt").write_text("ok")
+    runtime = make_runtime(DummyRenderer(), root=root)
+
+    output, _ = ai_engine_tools.handle_tool_call(
+        "read_file", {"path": str(sibling / "secret.txt")}, runtime
+    )
+    assert output.startswith("error: path outside project root")
+    output, _ = ai_engine_tools.handle_tool_call(
+        "read_file", {"path": "ok.txt"}, runtime
+    )
+    assert output == "Contents of ok.txt\n```\nok\n```"
+    assert ai_engine_tools.delete_path(sibling, runtime) == (
+        "error: delete outside project root"
+    )
+
+
+def test_delete_path_unlinks_files_without_spawning_a_shell(
+    monkeypatch, tmp_path: Path
+):
+    def fake_run(*args, **kwargs):
+        raise AssertionError("deleting a file should not run a command")
+
+    monkeypatch.setattr(ai_engine_tools, "run_sandboxed_bash", fake_run)
+    target = tmp_path / "old.txt"
+    target.write_text("bye\n")
+    (tmp_path / "pkg").mkdir()
+    runtime = make_runtime(DummyRenderer(), root=tmp_path)
+
+    assert ai_engine_tools.delete_path(target, runtime) == "applied"
+    assert not target.exists()
+    assert runtime.touched_paths == {target}
+    assert ai_engine_tools.delete_path(target, runtime) == (
+        "error: failed to delete old.txt: no such file"
+    )
+    assert ai_engine_tools.delete_path(tmp_path / "pkg", runtime) == (
+        "error: failed to delete pkg: is a directory"
+    )
+    assert (tmp_path / "pkg").is_dir()
+
+
+def test_delete_requests_never_remove_git_files(tmp_path: Path):
+    hook = tmp_path / ".git" / "hooks" / "pre-commit"
+    hook.parent.mkdir(parents=True)
+    hook.write_text("#!/bin/sh\n")
+
+    class DeletingRenderer(DummyRenderer):
+        def review_file_update(self, *args, **kwargs):  # type: ignore[override]
+            return "delete_requested"
+
+    runtime = make_runtime(DeletingRenderer(), root=tmp_path)
+    runtime.jfdi_enabled = True
+
+    result = ai_engine_tools.handle_tool_call(
+        "write", {"filePath": ".git/hooks/pre-commit", "content": ""}, runtime
+    )
+
+    assert result[0] == "error: .git modifications are not permitted"
+    assert ai_engine_tools.delete_path(hook, runtime) == result[0]
+    assert hook.exists()
+
+
+def test_shell_runs_mark_the_whole_tree_touched(monkeypatch, tmp_path: Path):
+    monkeypatch.setattr(
+        ai_engine_tools,
+        "run_sandboxed_bash",
+        lambda *a, **k: SimpleNamespace(exit_code=0, stdout="", stderr=""),
+    )
+    monkeypatch.setattr(ai_engine_tools, "format_command_result", lambda _res: "")
+    runtime = make_runtime(DummyRenderer(), root=tmp_path)
+    runtime.jfdi_enabled = True
+
+    ai_engine_tools.handle_tool_call("shell", {"command": "touch a.txt"}, runtime)
+
+    assert runtime.touched_paths == {tmp_path}
+
+
+def test_shell_command_list_only_quotes_unsafe_tokens(monkeypatch, tmp_path: Path):
+    runtime = make_runtime(DummyRenderer(), root=tmp_path)
+    runtime.jfdi_enabled = True
+    commands: list[str] = []
+
+    def fake_run(command, **_kwargs):
+        commands.append(command)
+        return SimpleNamespace(exit_code=0)
+
+    monkeypatch.setattr(ai_engine_tools, "run_sandboxed_bash", fake_run)
+    monkeypatch.setattr(ai_engine_tools, "format_command_result", lambda _res: "")
+    ai_engine_tools.handle_tool_call(
+        "shell",
+        {"command": ["grep", "-rn", "a b", "src/pkg_1.py", "--max-count=2", ""]},
+        runtime,
+    )
+    assert commands == ["grep -rn 'a b' src/pkg_1.py --max-count=2 ''"]
+
+
+def test_search_content_fallback_prefers_re2(monkeypatch, tmp_path: Path):
+    import re
+
+    compiled: list[str] = []
+
+    def fake_compile(pattern: str):
+        compiled.append(pattern)
+        if "\\1" in pattern:
+            raise ValueError("backreferences are not supported")
+        return re.compile(pattern)
+
+    monkeypatch.setattr(
+        ai_engine_tools, "_re2", SimpleNamespace(compile=fake_compile)
+    )
+
+    def fake_run(*args, **kwargs):
+        raise ai_engine_tools.CommandRejected("not allowed")
+
+    monkeypatch.setattr(ai_engine_tools, "run_sandboxed_bash", fake_run)
+    (tmp_path / "a.txt").write_text("Token\naa\n")
+    runtime = make_runtime(DummyRenderer(), root=tmp_path)
+
+    output, _ = ai_engine_tools.run_search_content(
+        {"pattern": "token$", "caseSensitive": False}, runtime
+    )
+    assert "a.txt:1: Token" in output
+    output, _ = ai_engine_tools.run_search_content({"pattern": r"(a)\1"}, runtime)
+    assert "a.txt:2: aa" in output
+    assert compiled == ["(?mi)token$", r"(?m)(a)\1"]
+
+
+def test_search_content_fallback_reads_whole_files(monkeypatch, tmp_path: Path):
+    def fake_run(*args, **kwargs):
+        raise ai_engine_tools.CommandRejected("not allowed")
+
+    monkeypatch.setattr(ai_engine_tools, "run_sandboxed_bash", fake_run)
+    (tmp_path / "crlf.txt").write_bytes(b"one\r\ntwo token\r\nthree\rtoken\r\n")
+    (tmp_path / "blob.bin").write_bytes(b"\0\1token\n")
+    (tmp_path / "other.txt").write_text("nothing here\n")
+    runtime = make_runtime(DummyRenderer(), root=tmp_path)
+
+    output, _ = ai_engine_tools.run_search_content({"pattern": "token$"}, runtime)
+    assert output.splitlines()[1:] == [
+        "crlf.txt:2: two token",
+        "crlf.txt:4: token",
+    ]
+
+
+def test_search_content_rg_resolves_each_file_once(monkeypatch, tmp_path: Path):
+    root = tmp_path / "repo"
+    root.mkdir()
+    (root / "app.py").write_text("a = 1\nb = 1\n")
+    (tmp_path / "outside.py").write_text("c = 1\n")
+
+    def match(path: str, line: int, text: str) -> str:
+        return json.dumps(
+            {
+                "type": "match",
+                "data": {
+                    "path": {"text": path},
+                    "lines": {"text": text},
+                    "line_number": line,
+                },
+            }
+        )
+
+    stdout = "\n".join(
+        [
+            match("app.py", 1, "a = 1\n"),
+            match("../outside.py", 1, "c = 1\n"),
+            match("app.py", 2, "b = 1\n"),
+        ]
+    )
+    result = CommandResult(
+        command="rg", exit_code=0, stdout=stdout, stderr="", truncated=False
+    )
+    monkeypatch.setattr(ai_engine_tools, "run_sandboxed_bash", lambda *a, **k: result)
+    resolved: list[Path] = []
+    original_resolve = Path.resolve
+
+    def counting_resolve(self, *args, **kwargs):
+        resolved.append(self)
+        return original_resolve(self, *args, **kwargs)
+
+    runtime = make_runtime(DummyRenderer(), root=root)
+    monkeypatch.setattr(Path, "resolve", counting_resolve)
+    output, _ = ai_engine_tools.run_search_content({"pattern": "= 1"}, runtime)
+
+    assert output.splitlines()[1:] == ["app.py:1: a = 1", "app.py:2: b = 1"]
+    assert sorted(map(str, resolved)) == sorted(
+        [str(root / "app.py"), str(root / "../outside.py")]
+    )
+
+
+def test_glob_search_does_not_walk_ignored_directories(monkeypatch, tmp_path: Path):
+    (tmp_path / ".git" / "objects").mkdir(parents=True)
+    (tmp_path / ".git" / "objects" / "a.py").write_text("x")
+    (tmp_path / "src" / "deep").mkdir(parents=True)
+    (tmp_path / "src" / "main.py").write_text("x")
+    (tmp_path / "src" / "deep" / "inner.py").write_text("x")
+    (tmp_path / "top.py").write_text("x")
+    visited: list[str] = []
+    original_scandir = ai_engine_tools.os.scandir
+
+    def recording_scandir(path):
+        visited.append(Path(path).relative_to(tmp_path).as_posix())
+        return original_scandir(path)
+
+    monkeypatch.setattr(ai_engine_tools.os, "scandir", recording_scandir)
+    runtime = make_runtime(DummyRenderer(), root=tmp_path)
+
+    output, _ = ai_engine_tools.run_glob_search({"pattern": "**/*.py"}, runtime)
+    assert sorted(output.splitlines()[1:]) == [
+        "src/deep/inner.py",
+        "src/main.py",
+        "top.py",
+    ]
+    assert ".git" not in " ".join(visited)
+
+    visited.clear()
+    output, _ = ai_engine_tools.run_glob_search({"pattern": "src/*.py"}, runtime)
+    assert output.splitlines()[1:] == ["src/main.py"]
+    assert visited == [".", "src"]
+
+
+def test_search_content_rg_skips_truncated_json_lines(monkeypatch, tmp_path: Path):
+    (tmp_path / "app.py").write_text("value = 42\n")
+    match = json.dumps(
+        {
+            "type": "match",
+            "data": {
+                "path": {"text": "app.py"},
+                "lines": {"text": "value = 42\n"},
+                "line_number": 1,
+            },
+        }
+    )
+    result = CommandResult(
+        command="rg",
+        exit_code=0,
+        stdout=f"{match}\n{match[:40]}",
+        stderr="",
+        truncated=True,
+    )
+    monkeypatch.setattr(ai_engine_tools, "run_sandboxed_bash", lambda *a, **k: result)
+    runtime = make_runtime(DummyRenderer(), root=tmp_path)
+
+    output, _ = ai_engine_tools.run_search_content({"pattern": "value"}, runtime)
+
+    assert output.splitlines()[1:] == ["app.py:1: value = 42"]
+
+
+def test_search_content_fallback_prunes_excluded_directories(
+    monkeypatch, tmp_path: Path
+):
+    def fake_run(*args, **kwargs):
+        raise ai_engine_tools.CommandRejected("not allowed")
+
+    monkeypatch.setattr(ai_engine_tools, "run_sandboxed_bash", fake_run)
+    (tmp_path / "node_modules" / "pkg").mkdir(parents=True)
+    (tmp_path / "node_modules" / "pkg" / "index.js").write_text("token\n")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.js").write_text("token\n")
+    (tmp_path / "src" / "app.min.js").write_text("token\n")
+    visited: list[str] = []
+    original_scandir = ai_engine_tools.os.scandir
+
+    def recording_scandir(path):
+        visited.append(Path(path).relative_to(tmp_path).as_posix())
+        return original_scandir(path)
+
+    monkeypatch.setattr(ai_engine_tools.os, "scandir", recording_scandir)
+    runtime = make_runtime(DummyRenderer(), root=tmp_path)
+
+    output, _ = ai_engine_tools.run_search_content(
+        {"pattern": "token", "exclude": ["node_modules/**", "*.min.js"]}, runtime
+    )
+
+    assert output.splitlines()[1:] == ["src/app.js:1: token"]
+    assert visited == [".", "src"]
+
+
+def test_search_content_fallback_combines_several_globs(monkeypatch, tmp_path: Path):
+    def fake_run(*args, **kwargs):
+        raise ai_engine_tools.CommandRejected("not allowed")
+
+    monkeypatch.setattr(ai_engine_tools, "run_sandboxed_bash", fake_run)
+    for name in ("a.py", "b.md", "c.txt", "test_a.py"):
+        (tmp_path / name).write_text("token\n")
+    runtime = make_runtime(DummyRenderer(), root=tmp_path)
+
+    output, _ = ai_engine_tools.run_search_content(
+        {
+            "pattern": "token",
+            "include": ["*.py", "*.md"],
+            "exclude": ["test_*", "*.txt"],
+        },
+        runtime,
+    )
+
+    assert sorted(output.splitlines()[1:]) == ["a.py:1: token", "b.md:1: token"]
+
+
+def test_search_content_fallback_checks_literals_in_raw_bytes(
+    monkeypatch, tmp_path: Path
+):
+    def fake_run(*args, **kwargs):
+        raise ai_engine_tools.CommandRejected("not allowed")
+
+    monkeypatch.setattr(ai_engine_tools, "run_sandboxed_bash", fake_run)
+    (tmp_path / "hit.py").write_text("x = 1\nname = 'café'\n")
+    (tmp_path / "legacy.txt").write_bytes(b"caf\xe9 name = 'caf\xc3\xa9'\r\n")
+    (tmp_path / "miss.py").write_text("nothing here\n")
+    runtime = make_runtime(DummyRenderer(), root=tmp_path)
+
+    output, _ = ai_engine_tools.run_search_content(
+        {"pattern": "name = 'café'"}, runtime
+    )
+
+    assert sorted(output.splitlines()[1:]) == [
+        "hit.py:2: name = 'café'",
+        "legacy.txt:1: caf name = 'café'",
+    ]
+
+
+def test_search_content_fallback_matches_lines_without_terminators(
+    monkeypatch, tmp_path: Path
+):
+    def fake_run(*args, **kwargs):
+        raise ai_engine_tools.CommandRejected("not allowed")
+
+    monkeypatch.setattr(ai_engine_tools, "run_sandboxed_bash", fake_run)
+    (tmp_path / "notes.txt").write_text("\n\n x\nxa \nend")
+    runtime = make_runtime(DummyRenderer(), root=tmp_path)
+
+    blank, _ = ai_engine_tools.run_search_content({"pattern": "^$"}, runtime)
+    trailing, _ = ai_engine_tools.run_search_content({"pattern": r"\s$"}, runtime)
+
+    assert blank.splitlines()[1:] == ["notes.txt:1: ", "notes.txt:2: "]
+    assert trailing.splitlines()[1:] == ["notes.txt:4: xa "]
+
+
+def test_search_patterns_and_glob_unions_are_compiled_once():
+    compile_pattern = ai_engine_tools._compile_search_pattern
+    assert compile_pattern("def (\\w+)", False) is compile_pattern("def (\\w+)", False)
+    union = ai_engine_tools._glob_union(("*.py", "docs/**"))
+    assert union is ai_engine_tools._glob_union(("*.py", "docs/**"))
+    assert union is not None and union("docs/a/b.md") and not union("a.md")
+    assert ai_engine_tools._glob_union(()) is None
+
+
+def test_write_tool_with_unchanged_content_never_reaches_the_reviewer(
+    tmp_path: Path,
+):
+    (tmp_path / "same.txt").write_text("same\n")
+
+    class FailingRenderer(DummyRenderer):
+        def review_file_update(self, *args, **kwargs):  # type: ignore[override]
+            raise AssertionError("identical content should not be reviewed")
+
+    runtime = make_runtime(FailingRenderer(), root=tmp_path)
+    runtime.jfdi_enabled = True
+    for _ in range(2):
+        result = ai_engine_tools.handle_tool_call(
+            "write", {"filePath": "same.txt", "content": "same\n"}, runtime
+        )
+        assert result == ("no_change", False)
+    assert runtime.seen_writes == {(str(tmp_path / "same.txt"), "same\n")}
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import pytest
+
+import bash_executor
+from bash_executor import CommandRejected, run_sandboxed_bash
+
+
+def _fake_profile(monkeypatch, tmp_path: Path) -> Path:
+    home = tmp_path / "home"
+    home.mkdir()
+    log = tmp_path / "sourced.log"
+    (home / ".bash_profile").write_text(
+        "export AI_PROFILE_VAR=from-profile\n"
+        "ai_profile_fn() { echo fn-ok; }\n"
+        f"echo sourced >> '{log}'\n"
+    )
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.delenv("BASH_ENV", raising=False)
+    monkeypatch.delenv("AI_PROFILE_VAR", raising=False)
+    monkeypatch.setattr(bash_executor, "_login_env_cache", None)
+    return log
+
+
+def test_commands_run_in_a_login_shell_by_default(monkeypatch, tmp_path: Path):
+    log = _fake_profile(monkeypatch, tmp_path)
+    monkeypatch.delenv("AI_BASH_CACHE_LOGIN_ENV", raising=False)
+
+    for _ in range(2):
+        result = run_sandboxed_bash(
+            "ai_profile_fn; echo $AI_PROFILE_VAR",
+            tmp_path,
+            tmp_path,
+            timeout=30,
+            max_output_bytes=100,
+        )
+        assert result.stdout == "fn-ok\nfrom-profile\n"
+
+    assert log.read_text() == "sourced\nsourced\n"
+
+
+def test_cached_login_environment_keeps_only_exports(monkeypatch, tmp_path: Path):
+    log = _fake_profile(monkeypatch, tmp_path)
+    monkeypatch.setenv("AI_BASH_CACHE_LOGIN_ENV", "1")
+
+    exported = run_sandboxed_bash(
+        "echo $AI_PROFILE_VAR", tmp_path, tmp_path, timeout=30, max_output_bytes=100
+    )
+    function = run_sandboxed_bash(
+        "ai_profile_fn", tmp_path, tmp_path, timeout=30, max_output_bytes=100
+    )
+
+    assert exported.stdout == "from-profile\n"
+    assert function.exit_code != 0
+    assert log.read_text() == "sourced\n"
+
+
+def test_rejects_parent_paths(tmp_path: Path):
+    with pytest.raises(CommandRejected):
+        run_sandboxed_bash(
+            "cat ../secret", tmp_path, tmp_path, timeout=5, max_output_bytes=100
+        )
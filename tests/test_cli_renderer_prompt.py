@@ -155,3 +155,17 @@ def test_format_diff_uses_visible_placeholders_for_missing_line_numbers():
 
     assert "   1    . | -port panda as peedee" in formatted
     assert "   .    1 | +import pandas as pd" in formatted
+
+
+def test_hotkey_pending_tracks_queued_events():
+    renderer = CLIRenderer()
+    assert renderer.hotkey_pending is False
+
+    renderer._enqueue_hotkey_event("retry")
+    renderer._enqueue_hotkey_event("quit")
+    assert renderer.hotkey_pending is True
+
+    assert renderer.poll_hotkey_event() == "retry"
+    assert renderer.hotkey_pending is True
+    assert renderer.poll_hotkey_event() == "quit"
+    assert renderer.hotkey_pending is False
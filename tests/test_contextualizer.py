@@ -11,6 +11,8 @@ from contextualizer import (
     DEFAULT_READ_LIMIT,
     MAX_READ_BYTES,
     CollectedContext,
+    refresh_paths,
+    scope_fingerprint,
 )
 
 
@@ -55,3 +57,44 @@ def test_collect_context_skips_listing_by_default(tmp_path: Path):
     context = collect_context(tmp_path)
     assert isinstance(context, CollectedContext)
     assert context.listing == []
+
+
+def test_refresh_paths_matches_full_collect(tmp_path: Path):
+    (tmp_path / "a.txt").write_text("alpha\n")
+    (tmp_path / "b.txt").write_text("beta\n")
+    (tmp_path / "pkg").mkdir()
+    context = collect_context(tmp_path, include_listing=True)
+    untouched = context.files[1]
+
+    (tmp_path / "a.txt").write_text("alpha v2\n")
+    (tmp_path / "c.txt").write_text("gamma\n")
+    refreshed = refresh_paths(
+        context, [tmp_path / "a.txt", tmp_path / "c.txt"]
+    )
+
+    assert refreshed == collect_context(tmp_path, include_listing=True)
+    assert refreshed.files[1] is untouched
+
+
+def test_scope_fingerprint_tracks_top_level_changes(tmp_path: Path):
+    target = tmp_path / "a.txt"
+    target.write_text("one\n")
+    (tmp_path / "pkg").mkdir()
+    before = scope_fingerprint(tmp_path)
+
+    (tmp_path / "pkg" / "nested.txt").write_text("ignored\n")
+    assert scope_fingerprint(tmp_path) == before
+
+    target.write_text("longer contents\n")
+    assert scope_fingerprint(tmp_path) != before
+
+
+def test_refresh_paths_resolves_touched_paths(tmp_path: Path):
+    (tmp_path / "a.txt").write_text("alpha\n")
+    (tmp_path / "pkg").mkdir()
+    context = collect_context(tmp_path)
+
+    (tmp_path / "a.txt").write_text("alpha v2\n")
+    refreshed = refresh_paths(context, [tmp_path / "pkg" / ".." / "a.txt"])
+
+    assert refreshed == collect_context(tmp_path)